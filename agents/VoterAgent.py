@@ -1,20 +1,134 @@
 from mesa import Agent
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 import os
 import pandas as pd
+from model.RandomStreams import integers
+
+VOTING_MATRIX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'op_voting_matrix')
+# Binary copies of the voting matrix CSVs, rebuilt whenever the source CSV changes
+VOTING_MATRIX_CACHE_DIR = os.path.join(VOTING_MATRIX_DIR, '.cache')
+
+# In-process copies of the loaded matrices, keyed by (csv path, mtime, size) and (.., K) once scaled
+_voting_matrix_cache = {}
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_voting_matrix(name, K=1, cache_dir=VOTING_MATRIX_CACHE_DIR):
+    """
+    Load a real voting matrix from data/op_voting_matrix, scaled by K.
+
+    The CSV is parsed once and stored as a .npy file named after the hash of its contents; a
+    small metadata file remembers the source mtime so the hash is only recomputed when the CSV
+    changes. The .npy file is memory-mapped, and the result is kept in-process so later steps
+    don't touch the disk at all.
+
+    Parameters:
+    - name: Name of the matrix, e.g. 'r4_voting_matrix' for data/op_voting_matrix/r4_voting_matrix.csv.
+    - K: Factor applied to the stored shares, typically the total number of tokens.
+    - cache_dir: Directory of the binary copies.
+
+    Returns:
+    - voting_matrix: A read-only (voters x projects) array; copy it before modifying it.
+    """
+    csv_path = os.path.join(VOTING_MATRIX_DIR, f'{name}.csv')
+    stat = os.stat(csv_path)
+    source_key = (csv_path, stat.st_mtime_ns, stat.st_size)
+
+    scaled_key = source_key + (K,)
+    if scaled_key in _voting_matrix_cache:
+        return _voting_matrix_cache[scaled_key]
+
+    if source_key not in _voting_matrix_cache:
+        _voting_matrix_cache[source_key] = _load_cached_csv(name, csv_path, stat, cache_dir)
+    voting_matrix = _voting_matrix_cache[source_key] * K
+    voting_matrix.flags.writeable = False
+    _voting_matrix_cache[scaled_key] = voting_matrix
+    return voting_matrix
+
+
+def _load_cached_csv(name, csv_path, stat, cache_dir):
+    metadata_path = os.path.join(cache_dir, f'{name}.json')
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+
+    if metadata.get('mtime_ns') == stat.st_mtime_ns and metadata.get('size') == stat.st_size:
+        sha256 = metadata['sha256']
+    else:
+        sha256 = _file_sha256(csv_path)
+
+    npy_path = os.path.join(cache_dir, f'{name}.{sha256[:16]}.npy')
+    if not os.path.exists(npy_path):
+        voting_matrix = pd.read_csv(csv_path, index_col=0).to_numpy(dtype=float)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write under a temporary name first so concurrent workers never read a partial file
+        tmp_path = f'{npy_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, voting_matrix)
+        os.replace(tmp_path, npy_path)
+
+    if metadata.get('sha256') != sha256 or metadata.get('mtime_ns') != stat.st_mtime_ns:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(metadata_path, 'w') as f:
+            json.dump({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256}, f)
+
+    return np.load(npy_path, mmap_mode='r')
+
+
+def _multinomial_rows(K, probabilities, rng=np.random):
+    """
+    Draw one multinomial vote of K tokens per row of `probabilities` (voters x projects).
+
+    np.random.multinomial only takes a single probability vector, so the rows are drawn together
+    as a chain of conditional binomials, one vectorized draw per project instead of one call per voter.
+    K is a scalar or one token count per row.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    num_rows, num_projects = probabilities.shape
+    votes = np.zeros((num_rows, num_projects), dtype=np.int64)
+    remaining_tokens = np.broadcast_to(np.asarray(K, dtype=np.int64), (num_rows,)).copy()
+    remaining_probability = np.ones(num_rows)
+    for j in range(num_projects - 1):
+        safe_remaining = np.where(remaining_probability > 0, remaining_probability, 1)
+        conditional = np.clip(probabilities[:, j] / safe_remaining, 0, 1)
+        votes[:, j] = rng.binomial(remaining_tokens, conditional)
+        remaining_tokens -= votes[:, j]
+        remaining_probability -= probabilities[:, j]
+    votes[:, -1] = remaining_tokens
+    return votes
 
 
 class VoterAgent(Agent):
-    def __init__(self, unique_id, model, voter_type, num_projects, total_op_tokens):
+    def __init__(self, unique_id, model, voter_type, num_projects, total_op_tokens, dtype=None, rng=None):
         super().__init__(unique_id, model)
         self.num_projects = num_projects
         self.total_op_tokens = total_op_tokens
         self.votes = np.zeros(num_projects)
         self.voter_type = voter_type
+        # Optional dtype of the generated voting matrix, e.g. np.float32 to halve the memory of large profiles
+        self.dtype = dtype
+        # Random stream of the generators, see model.RandomStreams (the global np.random stream by default)
+        self.rng = np.random if rng is None else rng
 
     
     def vote(self, num_voters):
+        votes = self._generate_votes(num_voters)
+        if self.dtype is not None:
+            votes = np.asarray(votes, dtype=self.dtype)
+        return votes
+
+    def _generate_votes(self, num_voters):
         if self.voter_type == 'r4_voting_matrix':
             return self.r4_voting_matrix(num_voters, self.num_projects, self.total_op_tokens,)
         elif self.voter_type == 'r1_voting_matrix':
@@ -23,6 +137,10 @@ class VoterAgent(Agent):
             return self.optimized_rn_model(num_voters, self.num_projects, self.total_op_tokens, alpha=2)  # Specify alpha as needed
         elif self.voter_type == 'mallows_model':
             return self.mallows_model_quick(num_voters, self.num_projects, self.total_op_tokens)
+        elif self.voter_type == 'mallows_swap_model':
+            return self.mallows_model(num_voters, self.num_projects, self.total_op_tokens)
+        elif self.voter_type == 'mallows_swap_aggregate_model':
+            return self.mallows_model_aggregate(num_voters, self.num_projects, self.total_op_tokens)
         elif self.voter_type == 'euclidean_model':
             return self.euclidean_model(num_voters, self.num_projects, self.total_op_tokens)
         elif self.voter_type == 'multinomial_model':
@@ -38,107 +156,91 @@ class VoterAgent(Agent):
     #alpha- number of copies returned to the urn. The higher the value of alpha, the stronger the correlation between votes.
 
     def random_uniform_model(self, n, m, K):
-        votes = []
-        for _ in range(n):
-            vote = np.random.dirichlet(np.ones(m)) * K
-            votes.append(vote)
-        return votes
+        return self.rng.dirichlet(np.ones(m), size=n) * K
     
-    def optimized_rn_model(self, n, m, K, alpha):
-        urn = [np.random.multinomial(K, [1.0/m] * m) for _ in range(100)]
-        votes = []
-        for i in range(n):
-            chosen_vote = np.random.choice(urn)
-            votes.append(chosen_vote)
-            urn.extend([chosen_vote] * alpha)
-        return votes
+    def optimized_rn_model(self, n, m, K, alpha, initial_urn_size=100):
+        # The urn is kept as its distinct ballots plus integer weights (copies in the urn)
+        urn_ballots = _multinomial_rows(K, np.full((initial_urn_size, m), 1.0 / m), self.rng)
+        urn_weights = np.ones(initial_urn_size, dtype=np.int64)
+        if alpha == 0:
+            chosen = integers(self.rng, initial_urn_size, size=n)
+        else:
+            # Drawing and returning alpha copies n times is a Polya urn, whose draws are exchangeable:
+            # they are distributed as n independent draws from ballot frequencies
+            # p ~ Dirichlet(urn_weights / alpha), which samples all voters at once in O(n + urn size)
+            probabilities = self.rng.dirichlet(urn_weights / alpha)
+            chosen = self.rng.choice(initial_urn_size, size=n, p=probabilities)
+        return urn_ballots[chosen]
 
     def mallows_model(self, n, m, K, base_vote=None):
+        # Every voter after the first copies the base vote and makes randint(0, K // 2) attempts
+        # to move one token between two uniformly chosen projects, where an attempt only moves a
+        # token if the source project still has one. The attempts run one after the other, so
+        # this takes O(K) steps per voter; see mallows_model_aggregate for an O(n m) approximation.
         if base_vote is None:
-            base_vote = np.random.multinomial(K, [1.0/m] * m)
+            base_vote = self.rng.multinomial(int(K), [1.0/m] * m)
         votes = [base_vote]
         for i in range(1, n):
-            noise = np.random.randint(0, K // 2)
+            noise = integers(self.rng, 0, int(K // 2))
+            from_projects = integers(self.rng, 0, m, size=noise)
+            to_projects = integers(self.rng, 0, m, size=noise)
             new_vote = base_vote.copy()
-            for _ in range(noise):
-                from_proj = np.random.choice(range(m))
-                to_proj = np.random.choice(range(m))
+            for from_proj, to_proj in zip(from_projects, to_projects):
                 if new_vote[from_proj] > 0:
                     new_vote[from_proj] -= 1
                     new_vote[to_proj] += 1
             votes.append(new_vote)
         return votes
-    
+
+    def mallows_model_aggregate(self, n, m, K, base_vote=None):
+        # Approximation of mallows_model that applies each voter's randint(0, K // 2) attempts in
+        # aggregate: the attempts leaving each project are a uniform multinomial split, a project
+        # gives away at most the tokens of the base vote, and the moved tokens land uniformly.
+        # Unlike the sequential attempts, tokens a project received earlier in the same voter's
+        # walk are never moved on, so a project can lose at most its base tokens and fewer
+        # attempts fail on an emptied project. The ballots stay close to the base vote as long
+        # as the number of attempts is small against K, but the distribution is not the same.
+        # This draws O(n m) random numbers for all voters at once, whatever the value of K.
+        if base_vote is None:
+            base_vote = self.rng.multinomial(int(K), [1.0/m] * m)
+        base_vote = np.asarray(base_vote)
+        uniform = np.full((n - 1, m), 1.0 / m)
+
+        noise = integers(self.rng, 0, int(K // 2), size=n - 1)
+        attempts_from = _multinomial_rows(noise, uniform, self.rng)
+        moved_out = np.minimum(attempts_from, base_vote)
+        moved_in = _multinomial_rows(np.sum(moved_out, axis=1), uniform, self.rng)
+
+        votes = np.empty((n, m), dtype=np.result_type(base_vote, moved_in))
+        votes[0] = base_vote
+        votes[1:] = base_vote - moved_out + moved_in
+        return votes
+
     def mallows_model_quick(self,n, m, K, alpha=0.5):
 
-        base_vote = np.random.dirichlet(np.ones(m), size=1) * K
-        votes = []
-        for i in range(n):
-            noisy_vote = (1 - alpha) * base_vote + alpha * np.random.dirichlet(np.ones(m), size=1) * K
-            votes.append(noisy_vote.flatten())
-        votes_matrix = np.array(votes)
+        base_vote = self.rng.dirichlet(np.ones(m), size=1) * K
+        votes_matrix = (1 - alpha) * base_vote + alpha * self.rng.dirichlet(np.ones(m), size=n) * K
         return votes_matrix 
 
 
     def euclidean_model(self, n, m, K):
-        projects = np.random.rand(m, 2)
-        voters = np.random.rand(n, 2)
-        votes = []
-        for voter in voters:
-            distances = np.linalg.norm(projects - voter, axis=1)
-            inverses = 1 / distances
-            total_inverse = np.sum(inverses)
-            proportions = inverses / total_inverse
-            vote = np.random.multinomial(K, proportions)
-            votes.append(vote)
-        return votes
+        projects = self.rng.random((m, 2))
+        voters = self.rng.random((n, 2))
+        # (voters x projects) distance matrix
+        distances = np.linalg.norm(voters[:, np.newaxis, :] - projects[np.newaxis, :, :], axis=-1)
+        inverses = 1 / distances
+        total_inverse = np.sum(inverses, axis=1, keepdims=True)
+        proportions = inverses / total_inverse
+        return _multinomial_rows(K, proportions, self.rng)
 
     def multinomial_model(self, n, m, K):
-        votes = []
-        for i in range(n):
-            probabilities = np.random.dirichlet(np.ones(m))
-            vote = np.random.multinomial(K, probabilities)
-            votes.append(vote)
-        return votes
+        probabilities = self.rng.dirichlet(np.ones(m), size=n)
+        return _multinomial_rows(K, probabilities, self.rng)
     
    
 
     def r4_voting_matrix(self,n,m,K):
-        # Get the current file's directory (this script's location)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-
-        # Define the relative path to the CSV file
-        relative_path = os.path.join(current_dir, '..', 'data','op_voting_matrix', 'r4_voting_matrix.csv')
-
-        # Load the voting matrix from the CSV file
-        voting_matrix_df = pd.read_csv(relative_path, index_col=0)
-
-        # Convert the DataFrame to a NumPy array
-        voting_matrix = voting_matrix_df.to_numpy()
-        voting_matrix=voting_matrix*K
-
-        # Ensure the shape of the matrix matches the expected shape
-        # if voting_matrix.shape != (self.num_projects, len(voting_matrix_df.index)):
-        #     raise ValueError("Voting matrix shape does not match expected dimensions")
-
-        return voting_matrix
+        return load_voting_matrix('r4_voting_matrix', K)
     
     def r1_voting_matrix(self,n,m,K):
-        # Get the current file's directory (this script's location)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-
-        # Define the relative path to the CSV file
-        relative_path = os.path.join(current_dir, '..', 'data', 'op_voting_matrix','r1_voting_matrix.csv')
-
-        # Load the voting matrix from the CSV file
-        voting_matrix_df = pd.read_csv(relative_path, index_col=0)
-
-        # Convert the DataFrame to a NumPy array
-        voting_matrix = voting_matrix_df.to_numpy()
-        voting_matrix=voting_matrix*K
-
-        # Ensure the shape of the matrix matches the expected shape
-        # if voting_matrix.shape != (self.num_projects, len(voting_matrix_df.index)):
-        #     raise ValueError("Voting matrix shape does not match expected dimensions")
-
-        return voting_matrix
+        return load_voting_matrix('r1_voting_matrix', K)
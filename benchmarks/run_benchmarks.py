@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.join(current_dir, '..')
+sys.path.append(project_root)
+from model.VotingModel import VotingModel
+from model.EvalMetrics import EvalMetrics
+from agents.VoterAgent import load_voting_matrix
+
+BASELINES_FILE = os.path.join(current_dir, 'baselines.json')
+
+# Profile sizes (num_voters x num_projects) and the real matrices of data/op_voting_matrix
+SIZES = ['10x10', '40x63', '100x500', '144x600', 'r1', 'r4']
+REAL_MATRICES = {'r1': 'r1_voting_matrix', 'r4': 'r4_voting_matrix'}
+
+TOTAL_OP_TOKENS = 8e6
+VOTER_TYPE = 'mallows_model'
+# Number of profiles of a batched (batch, voters, projects) rule call
+BATCH_SIZE = 32
+# A benchmark is repeated until it ran for at least this many seconds, then its fastest call is reported
+MIN_DURATION = 0.2
+MIN_REPEATS = 3
+# Relative slowdown (or memory growth) over the baseline that fails --check
+TOLERANCE = 0.5
+# Times --check re-runs the regressed benchmarks; only regressions in every run fail it
+RECHECKS = 2
+
+# Evaluation methods: (arguments for one round, largest voters x projects run by default). Methods
+# that re-run the rules on full profiles for every project (and voter) take minutes per round on the
+# large sizes, so they stop at 40x63 unless --all-sizes is given.
+METRICS = {
+    'evaluate_gini_index': ((1,), None),
+    'evaluate_alignment': ((1,), None),
+    'evaluate_social_welfare': ((1,), None),
+    'evaluate_egalitarian_score': ((1,), None),
+    'evaluate_robustness': ((1,), None),
+    'evaluate_bribery_optimized': ((1,), None),
+    'evaluate_control_optimized': ((1,), None),
+    'evaluate_vev_optimized': ((1,), None),
+    'evaluate_bribery': ((1,), 40 * 63),
+    'evaluate_bribery_avg': ((1,), 40 * 63),
+    'evaluate_control': ((1,), 40 * 63),
+    'evaluate_vev': ((1,), 40 * 63),
+}
+
+
+def build_model(size):
+    """
+    Model with a fixed profile of the given size ('NxM', or 'r1'/'r4' for the real matrices).
+    """
+    if size in REAL_MATRICES:
+        num_voters, num_projects = load_voting_matrix(REAL_MATRICES[size]).shape
+        voter_type = REAL_MATRICES[size]
+    else:
+        num_voters, num_projects = (int(value) for value in size.split('x'))
+        voter_type = VOTER_TYPE
+    model = VotingModel(voter_type, num_voters, num_projects, TOTAL_OP_TOKENS, seed=0)
+    model.step()
+    return model
+
+
+def measure(function, min_duration=MIN_DURATION, min_repeats=MIN_REPEATS, warmup=True):
+    """
+    Time `function()` and measure the peak memory it allocates.
+
+    Returns:
+    - latency: Seconds of the fastest call, the least disturbed by other load on the machine.
+    - peak_memory: Peak bytes allocated during one call, from tracemalloc (which also tracks numpy buffers).
+    """
+    if warmup:
+        # The first call also warms up caches, e.g. the real matrices
+        function()
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < min_repeats or time.perf_counter() - start < min_duration:
+        call_start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - call_start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak_memory
+
+
+def calibrate():
+    """
+    Seconds of a fixed reference workload (sorting, reductions and a Python loop, like the rules and
+    metrics), so --check compares latencies relative to the current speed of the machine.
+    """
+    values = np.random.default_rng(0).random((200, 500))
+
+    def reference():
+        np.sort(values, axis=0)
+        np.median(values, axis=0)
+        sum(value for value in range(20000))
+
+    latency, _ = measure(reference)
+    return latency
+
+
+def benchmark_rules(sizes, only=None):
+    """
+    Time every registered voting rule on one profile and on a batch of BATCH_SIZE profiles.
+
+    Parameters:
+    - sizes: Profile sizes to run.
+    - only: (Optional) Set of benchmark keys to run, default all.
+    """
+    results = {}
+    for size in sizes:
+        if only is not None and not any(key.startswith('rule') and key.endswith(f'/{size}') for key in only):
+            continue
+        model = build_model(size)
+        batch = np.repeat(model.voting_matrix[np.newaxis], BATCH_SIZE, axis=0)
+        for voting_rule in model.voting_rules:
+            key = f'rule/{voting_rule}/{size}'
+            if only is None or key in only:
+                latency, peak_memory = measure(lambda: model.allocate_funds(voting_rule))
+                results[key] = {'latency': latency, 'throughput': 1 / latency, 'peak_memory': peak_memory}
+                print(_format(key, results[key]), flush=True)
+
+            key = f'rule_batch/{voting_rule}/{size}'
+            if only is not None and key not in only:
+                continue
+            try:
+                latency, peak_memory = measure(lambda: model.allocate_funds(voting_rule, batch))
+            except ValueError:
+                # The rule only takes a single profile
+                continue
+            results[key] = {'latency': latency, 'throughput': BATCH_SIZE / latency, 'peak_memory': peak_memory}
+            print(_format(key, results[key]), flush=True)
+    return results
+
+
+def count_allocations(model):
+    """
+    Count the profiles allocated through model.allocate_funds; returns the one-element counter list.
+
+    Queries an IncrementalAllocator answers from its cached statistics do not go through
+    allocate_funds and are not counted.
+    """
+    counter = [0]
+    allocate_funds = model.allocate_funds
+
+    def counted_allocate_funds(method, voting_matrix=None):
+        shape = getattr(voting_matrix, 'shape', ())
+        counter[0] += shape[0] if len(shape) == 3 else 1
+        return allocate_funds(method, voting_matrix)
+
+    model.allocate_funds = counted_allocate_funds
+    return counter
+
+
+def benchmark_metrics(sizes, all_sizes=False, only=None):
+    """
+    Time every evaluate_* method for one round. Throughput is in profiles allocated through
+    allocate_funds per second, or in rounds per second for methods that allocate none.
+
+    Parameters:
+    - sizes: Profile sizes to run.
+    - all_sizes: Whether to run the full-profile methods beyond their default largest size.
+    - only: (Optional) Set of benchmark keys to run, default all.
+    """
+    results = {}
+    for size in sizes:
+        if only is not None and not any(key.startswith('metric/') and key.endswith(f'/{size}') for key in only):
+            continue
+        base_model = build_model(size)
+        num_cells = base_model.num_voters * base_model.num_projects
+        for method, (args, max_cells) in METRICS.items():
+            key = f'metric/{method}/{size}'
+            if only is not None and key not in only:
+                continue
+            if not all_sizes and max_cells is not None and num_cells > max_cells:
+                continue
+            model = build_model(size)
+            eval_metrics = EvalMetrics(model, quiet=True)
+            allocations = count_allocations(model)
+
+            def run():
+                # Every round starts from the same profile and random stream
+                model.reseed(0)
+                model.voting_matrix = base_model.voting_matrix.copy()
+                getattr(eval_metrics, method)(*args)
+
+            # The counted round is also the warm-up round
+            run()
+            allocations_per_round = allocations[0]
+            latency, peak_memory = measure(run, min_repeats=1, warmup=False)
+            results[key] = {'latency': latency, 'throughput': max(allocations_per_round, 1) / latency,
+                            'allocations': allocations_per_round, 'peak_memory': peak_memory}
+            print(_format(key, results[key]), flush=True)
+    return results
+
+
+def run_benchmarks(suite, sizes, all_sizes=False, only=None):
+    results = {}
+    if suite in ('rules', 'all'):
+        results.update(benchmark_rules(sizes, only))
+    if suite in ('metrics', 'all'):
+        results.update(benchmark_metrics(sizes, all_sizes, only))
+    return results
+
+
+def machine_info():
+    return {'platform': platform.platform(), 'processor': platform.processor(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'cpu_count': os.cpu_count()}
+
+
+def load_baselines(path=BASELINES_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results, calibration, path=BASELINES_FILE):
+    """
+    Store the results and the calibration time as the baselines, keeping the baselines of benchmarks
+    that were not run.
+    """
+    baselines = load_baselines(path) or {'benchmarks': {}}
+    baselines['machine'] = machine_info()
+    baselines['calibration'] = calibration
+    baselines['benchmarks'].update(results)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+
+def compare(results, baselines, tolerance=TOLERANCE, calibration=None):
+    """
+    Regressions of the results against the baselines.
+
+    Latencies are scaled by calibration / baselines['calibration'] first when that is above 1, so a
+    machine that is slower overall (e.g. a busy laptop) does not fail every benchmark. A faster
+    calibration does not tighten the tolerance.
+
+    Returns:
+    - regressions: List of (benchmark, measure, baseline, result) for every latency or peak memory
+                   more than `tolerance` above its baseline.
+    """
+    speed = 1.0
+    if calibration is not None and baselines.get('calibration'):
+        speed = max(calibration / baselines['calibration'], 1.0)
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines['benchmarks'].get(key)
+        if baseline is None:
+            continue
+        for measure_name, scale in (('latency', speed), ('peak_memory', 1.0)):
+            if result[measure_name] > baseline[measure_name] * scale * (1 + tolerance):
+                regressions.append((key, measure_name, baseline[measure_name], result[measure_name]))
+    return regressions
+
+
+def _format(key, result):
+    return (f"{key:<60} {result['latency'] * 1e3:>10.3f} ms {result['throughput']:>12.1f} /s "
+            f"{result['peak_memory'] / 1024 ** 2:>9.2f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the voting rules and evaluation metrics")
+    parser.add_argument('--suite', choices=('rules', 'metrics', 'all'), default='all')
+    parser.add_argument('--sizes', default=','.join(SIZES),
+                        help=f"Comma-separated profile sizes NxM, or r1/r4 for the real matrices (default: {','.join(SIZES)})")
+    parser.add_argument('--all-sizes', action='store_true',
+                        help="Also run the full-profile evaluation methods on the large sizes")
+    parser.add_argument('--save-baseline', action='store_true', help=f"Store the results as baselines in {BASELINES_FILE}")
+    parser.add_argument('--check', action='store_true',
+                        help="Compare against the baselines and exit with status 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f"Relative slowdown or memory growth tolerated by --check (default: {TOLERANCE})")
+    parser.add_argument('--output', metavar='JSON', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore', category=RuntimeWarning)
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    sizes = args.sizes.split(',')
+
+    # The reference workload runs before and after the benchmarks, its faster run is kept
+    calibration = calibrate()
+    print(f"{'benchmark':<60} {'latency':>13} {'throughput':>15} {'peak memory':>13}")
+    results = run_benchmarks(args.suite, sizes, args.all_sizes)
+
+    calibration = min(calibration, calibrate())
+    print(f"Calibration: {calibration * 1e3:.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'machine': machine_info(), 'calibration': calibration, 'benchmarks': results}, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        save_baselines(results, calibration)
+        print(f"Baselines saved to {BASELINES_FILE}")
+
+    if args.check:
+        baselines = load_baselines()
+        if baselines is None:
+            parser.error(f"no baselines in {BASELINES_FILE}, run with --save-baseline first")
+        if baselines.get('machine') != machine_info():
+            print("Warning: the baselines were recorded on a different machine or environment:", baselines.get('machine'))
+        regressions = compare(results, baselines, args.tolerance, calibration)
+        for _ in range(RECHECKS):
+            if not regressions:
+                break
+            # A burst of load on the machine slows down a few benchmarks at a time; a real
+            # regression shows up again on every run
+            print(f"Re-running {len({key for key, *_ in regressions})} regressed benchmarks")
+            only = {key for key, *_ in regressions}
+            recheck_calibration = calibrate()
+            rerun = run_benchmarks(args.suite, sizes, args.all_sizes, only)
+            recheck_calibration = min(recheck_calibration, calibrate())
+            regressions = [regression for regression in compare(rerun, baselines, args.tolerance, recheck_calibration)
+                           if regression[0] in only]
+        for key, measure_name, baseline, result in regressions:
+            print(f"REGRESSION {key} {measure_name}: {baseline:.6g} -> {result:.6g} ({result / baseline - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.tolerance:.0%} against {len(baselines['benchmarks'])} baselines")
+
+
+if __name__ == '__main__':
+    main()
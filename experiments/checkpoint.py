@@ -0,0 +1,157 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Fields identifying one unit of a sweep; every other field of a record is a result of the unit
+UNIT_KEYS = ('desired_increase', 'round', 'voting_rule')
+
+RESULTS_FILE = 'results.jsonl'
+PARAMETERS_FILE = 'parameters.json'
+
+
+class ResultStore:
+    """
+    Append-only store of the completed units of an experiment sweep.
+
+    Every completed unit, by default a (desired increase, round, voting rule), is one JSON line of
+    `results.jsonl` in the output directory, written and flushed to disk as soon as its task
+    finishes. A sweep killed at any point loses at most the tasks that were running: on restart
+    with the same directory, completed units are read back and skipped.
+
+    The parameters of the sweep, including the entropy of its root seed, are kept in
+    `parameters.json`, so a resumed sweep draws the same random streams as the original one and
+    cannot be resumed with different parameters by accident.
+    """
+
+    def __init__(self, directory, parameters, unit_keys=UNIT_KEYS):
+        self.directory = directory
+        self.unit_keys = tuple(unit_keys)
+        self.path = os.path.join(directory, RESULTS_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+        parameters_path = os.path.join(directory, PARAMETERS_FILE)
+        if os.path.exists(parameters_path):
+            with open(parameters_path) as f:
+                stored_parameters = json.load(f)
+            # The seed of a resumed sweep is the stored one; everything else must match
+            changed = {key for key in parameters
+                       if key != 'seed' and parameters[key] != stored_parameters.get(key)}
+            if changed:
+                raise ValueError(f"Cannot resume {directory}: parameters {sorted(changed)} differ from the stored run")
+            parameters = stored_parameters
+        else:
+            with open(parameters_path, 'w') as f:
+                json.dump(parameters, f, indent=2)
+        self.parameters = parameters
+
+        self._records = self._read_records()
+        self._completed = {self.unit(record) for record in self._records}
+
+    def unit(self, record):
+        return tuple(record[key] for key in self.unit_keys)
+
+    def is_complete(self, unit):
+        return unit in self._completed
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self):
+        """
+        The completed units, in the order they were stored.
+        """
+        return list(self._records)
+
+    def append(self, records):
+        """
+        Append completed units and force them to disk.
+        """
+        with open(self.path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._records.extend(records)
+        self._completed.update(self.unit(record) for record in records)
+
+    def to_frame(self, wide=True):
+        """
+        Completed units as a DataFrame sorted by unit.
+
+        Parameters:
+        - wide: Whether to use the layout of the EvalMetrics results with a column per rule: one row
+                per unit without its voting rule, one `{voting_rule}_{result}` column per rule and
+                result. Otherwise one row per record.
+        """
+        row_keys = [key for key in self.unit_keys if key != 'voting_rule']
+        if not wide:
+            return pd.DataFrame(sorted(self._records, key=lambda record: self._sort_key(record, self.unit_keys)))
+
+        rows = {}
+        for record in self._records:
+            row = rows.setdefault(tuple(record[key] for key in row_keys), {key: record[key] for key in row_keys})
+            for key, value in record.items():
+                if key not in self.unit_keys:
+                    row[key if record['voting_rule'] is None else f"{record['voting_rule']}_{key}"] = value
+        return pd.DataFrame([rows[key] for key in sorted(rows)])
+
+    @staticmethod
+    def _sort_key(record, keys):
+        # None sorts first, so units without a voting rule do not break the ordering
+        return tuple((record[key] is not None, record[key]) for key in keys)
+
+    def _read_records(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        # A line cut short by a crash is dropped and overwritten by the next append
+        complete_length = content.rfind(b'\n') + 1
+        if complete_length < len(content):
+            with open(self.path, 'r+b') as f:
+                f.truncate(complete_length)
+        return [json.loads(line) for line in content[:complete_length].decode().splitlines() if line]
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def split_by_rule(results, voting_rules, unit_keys=UNIT_KEYS):
+    """
+    Split an EvalMetrics results frame with one `{voting_rule}_{result}` column per rule into one
+    record per unit.
+
+    A `{voting_rule}_{result}` column becomes the `result` field of the rule's records. Columns of
+    no rule (e.g. the size of a vote change shared by all rules) go to a record with voting_rule
+    None, written before the rule records of the same row.
+    """
+    row_keys = [key for key in unit_keys if key != 'voting_rule']
+    records = []
+    for row in results.to_dict('records'):
+        keys = {key: _json_value(row[key]) for key in row_keys}
+        rule_columns = set()
+        rule_records = []
+        for voting_rule in voting_rules:
+            record = dict(keys, voting_rule=voting_rule)
+            prefix = f'{voting_rule}_'
+            for column, value in row.items():
+                if column.startswith(prefix):
+                    record[column[len(prefix):]] = _json_value(value)
+                    rule_columns.add(column)
+            rule_records.append(record)
+        shared = {column: _json_value(value) for column, value in row.items()
+                  if column not in rule_columns and column not in row_keys}
+        if shared:
+            records.append(dict(keys, voting_rule=None, **shared))
+        records.extend(rule_records)
+    return records
+
+
+def frame_records(results):
+    """
+    Records of a results frame that already has one row per unit, e.g. a round and voting rule of the VEV.
+    """
+    return [{column: _json_value(value) for column, value in row.items()} for row in results.to_dict('records')]
@@ -8,4 +8,6 @@ quorum = 17
 min_increase = 1
 max_increase = 30
 iterations = 30
+# Root seed of the parallel experiments; None draws fresh entropy, which is recorded with the results
+seed = None
 experiment_description = f'mallows_model_{num_voters}_{num_projects}_{total_op_tokens}'
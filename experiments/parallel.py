@@ -0,0 +1,117 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.join(current_dir, '..')
+sys.path.append(project_root)
+from model.VotingModel import VotingModel
+from model.EvalMetrics import EvalMetrics
+
+# Models of the current worker process built on demand by cached_worker_model, keyed by their parameters
+_worker_models = {}
+# Shared voting matrices attached by cached_voting_matrix, keyed by the name of their shared memory block
+_worker_voting_matrices = {}
+
+
+def share_voting_matrix(voting_matrix):
+    """
+    Copy a voting matrix into a shared memory block.
+
+    Returns:
+    - shm: The SharedMemory block; the caller must close() and unlink() it when the workers are done.
+    - handle: A small picklable (name, shape, dtype) tuple that workers pass to attach_voting_matrix.
+    """
+    voting_matrix = np.ascontiguousarray(voting_matrix)
+    shm = shared_memory.SharedMemory(create=True, size=max(voting_matrix.nbytes, 1))
+    shared_matrix = np.ndarray(voting_matrix.shape, dtype=voting_matrix.dtype, buffer=shm.buf)
+    shared_matrix[...] = voting_matrix
+    return shm, (shm.name, voting_matrix.shape, voting_matrix.dtype.str)
+
+
+def attach_voting_matrix(handle):
+    """
+    Map a shared voting matrix into the current process without copying it.
+
+    Returns:
+    - shm: The SharedMemory block, which must stay referenced while the matrix is used.
+    - voting_matrix: A read-only array view of the shared block.
+    """
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    voting_matrix = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    voting_matrix.flags.writeable = False
+    return shm, voting_matrix
+
+
+def _run_indexed_task(indexed_task):
+    # imap_unordered passes a single argument, and results need their task id to be put back in order
+    task_id, function, args = indexed_task
+    return task_id, function(*args)
+
+
+def iter_tasks(function, task_args, num_workers=None, task_ids=None):
+    """
+    Yield (task id, function(*args)) pairs for every tuple of `task_args` as soon as each task completes.
+
+    Parameters:
+    - function: Module-level function run in the workers.
+    - task_args: Iterable of argument tuples, one per task.
+    - num_workers: Number of worker processes (default: number of CPU cores); 1 runs the tasks
+                   one after the other in the current process.
+    - task_ids: (Optional) Id of every task, default 0..len(task_args)-1.
+    """
+    if num_workers is None:
+        num_workers = mp.cpu_count()
+    task_args = list(task_args)
+    if task_ids is None:
+        task_ids = range(len(task_args))
+    indexed_tasks = [(task_id, function, args) for task_id, args in zip(task_ids, task_args)]
+
+    if num_workers == 1:
+        for indexed_task in indexed_tasks:
+            yield _run_indexed_task(indexed_task)
+        return
+
+    with mp.Pool(processes=num_workers) as pool:
+        for result in pool.imap_unordered(_run_indexed_task, indexed_tasks):
+            yield result
+
+
+def cached_worker_model(worker_model_params):
+    """
+    VotingModel and EvalMetrics for `worker_model_params` in the current process, built on first use.
+
+    A worker serves tasks of any model setup, e.g. the points of a parameter grid, and only
+    builds the setups it is actually given. The models start without a profile.
+    """
+    key = tuple(sorted(worker_model_params.items()))
+    if key not in _worker_models:
+        model = VotingModel(**worker_model_params)
+        _worker_models[key] = model, EvalMetrics(model, quiet=True)
+    return _worker_models[key]
+
+
+def cached_voting_matrix(handle):
+    """
+    Shared voting matrix of `handle` (see share_voting_matrix) in the current process, attached
+    on first use, so the tasks of a worker map the block once instead of receiving a copy each.
+    """
+    name = handle[0]
+    if name not in _worker_voting_matrices:
+        _worker_voting_matrices[name] = attach_voting_matrix(handle)
+    return _worker_voting_matrices[name][1]
+
+
+def release_voting_matrices():
+    """
+    Detach the shared voting matrices attached by cached_voting_matrix in the current process.
+    The arrays must no longer be referenced elsewhere.
+    """
+    while _worker_voting_matrices:
+        _, (shm, voting_matrix) = _worker_voting_matrices.popitem()
+        del voting_matrix
+        shm.close()
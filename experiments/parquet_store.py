@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Default location of the columnar store shared by all runs
+PARQUET_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'experiment_results', 'parquet')
+
+# Partition columns: one directory level each (experiment=vev/voter_type=mallows_model/...), so a
+# query on them only opens the matching files
+PARTITION_SCHEMA = pa.schema([
+    ('experiment', pa.string()),
+    ('voter_type', pa.string()),
+    ('num_voters', pa.int32()),
+    ('num_projects', pa.int32()),
+])
+
+# One row per metric value. voting_rule is null for values shared by all rules (e.g. the size of a
+# vote change), level (the desired increase) is null for experiments without levels. The seed is the
+# root entropy of the run, a 128-bit integer kept as its decimal string.
+SCHEMA = pa.schema(list(PARTITION_SCHEMA) + [
+    ('total_op_tokens', pa.float64()),
+    ('voting_rule', pa.string()),
+    ('level', pa.float64()),
+    ('round', pa.int32()),
+    ('metric', pa.string()),
+    ('value', pa.float64()),
+    ('seed', pa.string()),
+    ('run', pa.string()),
+])
+
+
+class ParquetStore:
+    """
+    Columnar store of experiment results, partitioned by experiment, voter type and profile size.
+
+    Every append writes new Parquet files into the partition directories and never rewrites the
+    existing ones, so several writers (e.g. worker processes) can append concurrently as long as
+    they use different names. Appending again under the same name replaces that name's files,
+    which keeps re-exports of a resumed run idempotent.
+
+    Reads go through pyarrow.dataset: filters on the partition columns skip whole directories, and
+    filters on the other columns are pushed down to the Parquet row groups.
+    """
+
+    def __init__(self, root=PARQUET_STORE_DIR):
+        self.root = root
+        self.partitioning = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+    def append(self, frame, name):
+        """
+        Append rows in the layout of SCHEMA.
+
+        Parameters:
+        - frame: DataFrame with the columns of SCHEMA; missing columns are null.
+        - name: Basename of the written files, unique per writer (e.g. run and grid point).
+        """
+        if len(frame) == 0:
+            return
+        table = pa.Table.from_pandas(frame.reindex(columns=SCHEMA.names), schema=SCHEMA, preserve_index=False)
+        ds.write_dataset(table, self.root, format='parquet', partitioning=self.partitioning,
+                         basename_template=f'{name}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore')
+
+    def append_records(self, records, parameters, experiment, run, name=None):
+        """
+        Append the checkpoint records of one experiment at one grid point, see checkpoint.ResultStore.
+
+        Every result field of a record becomes one row with its metric name; values that are not
+        numbers (e.g. "Not Possible") are stored as NaN.
+        """
+        rows = []
+        for record in records:
+            for metric, value in record.items():
+                if metric in ('desired_increase', 'round', 'voting_rule'):
+                    continue
+                rows.append({'voting_rule': record.get('voting_rule'), 'level': record.get('desired_increase'),
+                             'round': record['round'], 'metric': metric, 'value': _as_float(value)})
+        frame = pd.DataFrame(rows, columns=['voting_rule', 'level', 'round', 'metric', 'value'])
+        frame['experiment'] = experiment
+        for key in ('voter_type', 'num_voters', 'num_projects', 'total_op_tokens'):
+            frame[key] = parameters[key]
+        frame['seed'] = str(parameters['seed'])
+        frame['run'] = run
+        self.append(frame, name or run)
+
+    def dataset(self):
+        return ds.dataset(self.root, format='parquet', partitioning=self.partitioning, schema=SCHEMA)
+
+    def read(self, columns=None, filter=None, **equals):
+        """
+        Read the rows matching the filters as a DataFrame.
+
+        Parameters:
+        - columns: (Optional) Columns to read, default all.
+        - filter: (Optional) pyarrow.dataset expression, e.g. ds.field('value') > 0.
+        - equals: Column values to match, a value or a list of accepted values per column,
+                  e.g. experiment='vev', num_projects=[63, 145].
+
+        Example:
+            store.read(experiment='bribery', voting_rule=['r2_mean', 'r3_median'], metric='bribery_cost')
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or SCHEMA.names)
+        expression = filter
+        for column, value in equals.items():
+            if isinstance(value, (list, tuple, set, np.ndarray)):
+                condition = ds.field(column).isin(list(value))
+            else:
+                condition = ds.field(column) == value
+            expression = condition if expression is None else expression & condition
+        return self.dataset().to_table(columns=columns, filter=expression).to_pandas()
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,452 @@
+import argparse
+import ast
+import itertools
+import json
+import os
+import sys
+import traceback
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.join(current_dir, '..')
+sys.path.append(project_root)
+from model.VotingModel import VotingModel
+from model.RandomStreams import child_seed
+import experiments_config
+import parallel
+import checkpoint
+from parquet_store import ParquetStore, PARQUET_STORE_DIR
+
+# Parameters of an experiment run, with their defaults from experiments_config
+PARAMETERS = ('num_voters', 'num_projects', 'total_op_tokens', 'voter_type', 'num_rounds', 'quorum',
+              'min_increase', 'max_increase', 'iterations', 'seed')
+
+# Parameters that define the model a task runs on
+MODEL_PARAMETERS = ('voter_type', 'num_voters', 'num_projects', 'total_op_tokens')
+
+
+def _evaluate_bribery(eval_metrics, desired_increase):
+    return eval_metrics.evaluate_bribery(1, desired_increase)
+
+
+def _evaluate_control(eval_metrics, desired_increase):
+    return eval_metrics.evaluate_control(num_rounds=1, desired_increase=desired_increase)
+
+
+def _evaluate_vev(eval_metrics, desired_increase):
+    return eval_metrics.evaluate_vev(1)
+
+
+def _evaluate_vev_sampled(eval_metrics, desired_increase):
+    return eval_metrics.evaluate_vev_optimized(1)
+
+
+def _evaluate_robustness(eval_metrics, desired_increase):
+    return eval_metrics.evaluate_robustness(num_rounds=1)
+
+
+# Experiments of the runner. Each one evaluates one round per task:
+# - evaluate: Function of (eval_metrics, desired_increase) returning the EvalMetrics results of one round.
+# - levels: Whether the experiment is swept over desired increases (np.linspace(min_increase, max_increase, iterations)).
+# - base_profile: Whether all rounds share one base profile instead of drawing a new one per round.
+# - wide: Whether the results have a column per voting rule (otherwise a voting_rule column).
+# - output: Prefix of the results CSV file.
+# - cost: Relative cost of one round for (num_voters, num_projects), used to schedule the biggest tasks first.
+#   Bribery bisects every project on full allocations (~40 O(n m) allocations per project), control
+#   removes and adds voters per project, VEV tries a batch of ballots per voter and project, the
+#   sampled VEV 10 ballots for each of 10 sampled voters and projects, and robustness perturbs a single ballot.
+EXPERIMENTS = {
+    'bribery': {'evaluate': _evaluate_bribery, 'levels': True, 'base_profile': False, 'wide': True,
+                'output': 'bribery_experiment_results', 'cost': lambda n, m: 40 * n * m ** 2},
+    'control': {'evaluate': _evaluate_control, 'levels': True, 'base_profile': False, 'wide': True,
+                'output': 'control_experiment_results', 'cost': lambda n, m: 2 * n * m ** 2},
+    'vev': {'evaluate': _evaluate_vev, 'levels': False, 'base_profile': False, 'wide': False,
+            'output': 'vev_results', 'cost': lambda n, m: 10 * n * m ** 2},
+    'vev_sampled': {'evaluate': _evaluate_vev_sampled, 'levels': False, 'base_profile': False, 'wide': False,
+                    'output': 'vev_results', 'cost': lambda n, m: 1000 * n * m},
+    'robustness': {'evaluate': _evaluate_robustness, 'levels': False, 'base_profile': True, 'wide': True,
+                   'output': 'robustness_results', 'cost': lambda n, m: n * m},
+}
+
+
+def default_parameters():
+    return {name: getattr(experiments_config, name, None) for name in PARAMETERS}
+
+
+def parse_grid(assignments):
+    """
+    Parse `key=value1,value2` assignments into a {key: [values]} grid; values are Python literals or strings.
+
+    `size=NxM,...` sweeps (num_voters, num_projects) pairs together instead of their cartesian product.
+    """
+    grid = {}
+    for assignment in assignments:
+        key, _, values = assignment.partition('=')
+        _check_grid_key(key)
+        if key == 'size':
+            grid[key] = [tuple(int(size) for size in value.split('x')) for value in values.split(',')]
+        else:
+            grid[key] = [_parse_value(value) for value in values.split(',')]
+    return grid
+
+
+def _check_grid_key(key):
+    if key not in PARAMETERS and key != 'size':
+        raise ValueError(f"Unknown parameter: {key}")
+
+
+def _parse_value(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def grid_points(grid, defaults=None):
+    """
+    Parameters of every point of the grid, the defaults updated with one combination of the grid values.
+    """
+    defaults = default_parameters() if defaults is None else defaults
+    keys = list(grid)
+    points = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        parameters = dict(defaults, **dict(zip(keys, values)))
+        if 'size' in parameters:
+            parameters['num_voters'], parameters['num_projects'] = parameters.pop('size')
+        points.append(parameters)
+    return points
+
+
+def point_name(parameters, grid):
+    """
+    Output directory name of a grid point, in the format of experiments_config.experiment_description.
+    """
+    name = f"{parameters['voter_type']}_{parameters['num_voters']}_{parameters['num_projects']}_{parameters['total_op_tokens']}"
+    extra = [f'{key}{parameters[key]}' for key in grid if key not in MODEL_PARAMETERS + ('size',)]
+    return '_'.join([name] + extra)
+
+
+def experiment_tasks(experiment, parameters):
+    """
+    (desired_increase, round_num) pairs of the experiment; desired_increase is None for experiments without levels.
+    """
+    rounds = range(1, parameters['num_rounds'] + 1)
+    if not EXPERIMENTS[experiment]['levels']:
+        return [(None, round_num) for round_num in rounds]
+    levels = np.linspace(parameters['min_increase'], parameters['max_increase'], parameters['iterations'])
+    return [(float(level), round_num) for level in levels for round_num in rounds]
+
+
+def unit_keys(experiment):
+    if EXPERIMENTS[experiment]['levels']:
+        return checkpoint.UNIT_KEYS
+    return ('round', 'voting_rule')
+
+
+def base_voting_matrix(model_params, seed):
+    """
+    Base profile shared by all rounds of an experiment with `base_profile`, drawn from child (0,) of the point's seed.
+    """
+    model = VotingModel(**model_params, seed=child_seed(np.random.SeedSequence(seed), 0))
+    return model.step()
+
+
+def run_task(experiment, model_params, seed, task_id, desired_increase, round_num, matrix_handle=None):
+    """
+    Evaluate one round of an experiment in the current (worker) process.
+
+    The model is built on first use for its parameters. Task i draws from child (1, i) of the
+    point's seed. Rounds on a base profile read it from the shared memory block of
+    `matrix_handle`, which the parent drew once per grid point, see base_voting_matrix.
+    """
+    spec = EXPERIMENTS[experiment]
+    model, eval_metrics = parallel.cached_worker_model(model_params)
+    model.reseed(child_seed(child_seed(np.random.SeedSequence(seed), 1), task_id))
+    if matrix_handle is None:
+        results = spec['evaluate'](eval_metrics, desired_increase)
+    else:
+        # The model only borrows the read-only shared profile for this task
+        previous_voting_matrix = model.voting_matrix
+        model.voting_matrix = parallel.cached_voting_matrix(matrix_handle)
+        try:
+            results = spec['evaluate'](eval_metrics, desired_increase)
+        finally:
+            model.voting_matrix = previous_voting_matrix
+
+    results['round'] = round_num
+    if spec['levels']:
+        results['desired_increase'] = desired_increase
+    return results
+
+
+def _run_task_or_error(*task_args):
+    # A failing round is reported with its traceback instead of stopping the pool and the whole sweep
+    try:
+        return run_task(*task_args), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+class _Sweep:
+    # Result store and pending tasks of one experiment at one grid point
+    def __init__(self, experiment, parameters, output_dir):
+        self.experiment = experiment
+        self.spec = EXPERIMENTS[experiment]
+        self.output_dir = output_dir
+        self.store = checkpoint.ResultStore(output_dir, parameters, unit_keys(experiment))
+        self.parameters = self.store.parameters
+        self.model_params = {key: self.parameters[key] for key in MODEL_PARAMETERS}
+        # Only the rule names are needed here; the workers build their models themselves
+        self.voting_rules = list(VotingModel(**self.model_params).voting_rules.keys())
+
+        self.tasks = experiment_tasks(experiment, self.parameters)
+        self.pending = [(task_id, desired_increase, round_num)
+                        for task_id, (desired_increase, round_num) in enumerate(self.tasks)
+                        if not all(self.store.is_complete(unit)
+                                   for unit in _task_units(experiment, desired_increase, round_num, self.voting_rules))]
+        self.cost = self.spec['cost'](self.parameters['num_voters'], self.parameters['num_projects'])
+        # Traceback of the first failed round; the outputs of a failed sweep are not written
+        self.error = None
+        self._shm = None
+
+    def task_args(self):
+        """
+        Arguments of run_task for the pending rounds. The base profile of an experiment that has
+        one is drawn here once and placed in shared memory; call close() when the rounds are done.
+        """
+        matrix_handle = None
+        if self.spec['base_profile'] and self.pending:
+            self._shm, matrix_handle = parallel.share_voting_matrix(
+                base_voting_matrix(self.model_params, self.parameters['seed']))
+        return [(self.experiment, self.model_params, self.parameters['seed'], task_id, desired_increase, round_num,
+                 matrix_handle)
+                for task_id, desired_increase, round_num in self.pending]
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def store_results(self, results):
+        if self.spec['wide']:
+            records = checkpoint.split_by_rule(results, self.voting_rules, self.store.unit_keys)
+        else:
+            records = checkpoint.frame_records(results)
+        # Units of a partially stored task were recomputed with the same seed; keep the stored ones
+        self.store.append([record for record in records if not self.store.is_complete(self.store.unit(record))])
+
+    def results(self):
+        return self.store.to_frame(wide=self.spec['wide'])
+
+    def export(self, parquet_store, run):
+        # One file set per run and sweep, so exporting a resumed run again replaces it
+        name = '-'.join([run, os.path.basename(os.path.dirname(self.output_dir)), self.experiment])
+        parquet_store.append_records(self.store.records(), self.parameters, self.experiment, run, name)
+
+
+def run_sweep(sweeps, num_workers=None, parquet_store=None, run=None):
+    """
+    Run (or resume) several experiments and grid points in a single pool, checkpointing every completed unit.
+
+    The rounds of all sweeps are dispatched as independent tasks, the most expensive first
+    (longest processing time first, by the `cost` estimate of their experiment and size), so
+    the large points start right away and the small ones fill the workers at the end.
+
+    A round that raises fails its sweep only: the error is reported, the rounds of the other
+    sweeps still run, and the completed rounds of the failed sweep stay in its result store.
+
+    Parameters:
+    - sweeps: List of (experiment, parameters, output_dir) triples, see run_experiment.
+    - num_workers: Number of worker processes; 1 runs the tasks in the current process.
+    - parquet_store: (Optional) ParquetStore the results of every successful sweep are exported to.
+    - run: Name of the run in the parquet store, e.g. the name of its output directory.
+
+    Returns:
+    - results: List of (results, parameters, error) triples, one per sweep, see run_experiment;
+               error is the traceback of the first failed round of the sweep, or None.
+    """
+    sweeps = [_Sweep(experiment, parameters, output_dir) for experiment, parameters, output_dir in sweeps]
+    for sweep in sweeps:
+        print(f"{sweep.experiment}: {len(sweep.tasks) - len(sweep.pending)}/{len(sweep.tasks)} rounds already "
+              f"completed, running {len(sweep.pending)} in {sweep.output_dir}")
+
+    try:
+        # sorted() is stable, so equally expensive tasks keep the order of their sweep
+        scheduled = sorted(((sweep_index, task_args) for sweep_index, sweep in enumerate(sweeps)
+                            for task_args in sweep.task_args()),
+                           key=lambda task: sweeps[task[0]].cost, reverse=True)
+        if scheduled:
+            task_ids = range(len(scheduled))
+            for task_id, (results, error) in parallel.iter_tasks(
+                    _run_task_or_error, [task_args for _, task_args in scheduled], num_workers, task_ids):
+                sweep = sweeps[scheduled[task_id][0]]
+                if error is None:
+                    sweep.store_results(results)
+                elif sweep.error is None:
+                    sweep.error = error
+                    print(f"{sweep.experiment} failed in {sweep.output_dir}, its outputs are skipped:\n{error}")
+    finally:
+        if num_workers == 1:
+            parallel.release_voting_matrices()
+        for sweep in sweeps:
+            sweep.close()
+
+    if parquet_store is not None:
+        for sweep in sweeps:
+            if sweep.error is None:
+                sweep.export(parquet_store, run)
+    return [(sweep.results(), sweep.parameters, sweep.error) for sweep in sweeps]
+
+
+def run_experiment(experiment, parameters, output_dir, num_workers=None):
+    """
+    Run (or resume) one experiment at one parameter point, checkpointing every completed unit.
+
+    Parameters:
+    - experiment: Name of the experiment, see EXPERIMENTS.
+    - parameters: Parameters of the point, see PARAMETERS; the seed is the root entropy of the run.
+    - output_dir: Directory of the point's result store and outputs.
+    - num_workers: Number of worker processes; 1 runs the tasks in the current process.
+
+    Returns:
+    - results: The results of all rounds, in the layout of the EvalMetrics results.
+    - parameters: The parameters of the run, those stored in output_dir when it is resumed.
+
+    Raises:
+    - RuntimeError: If a round failed; the completed rounds are kept for a resume.
+    """
+    results, parameters, error = run_sweep([(experiment, parameters, output_dir)], num_workers)[0]
+    if error is not None:
+        raise RuntimeError(f"{experiment} failed in {output_dir}:\n{error}")
+    return results, parameters
+
+
+def _task_units(experiment, desired_increase, round_num, voting_rules):
+    if EXPERIMENTS[experiment]['levels']:
+        return [(desired_increase, round_num, voting_rule) for voting_rule in voting_rules]
+    return [(round_num, voting_rule) for voting_rule in voting_rules]
+
+
+def summarize(experiment, results):
+    """
+    Average the rounds of every desired increase, or return the rounds as they are for experiments without levels.
+    """
+    if not EXPERIMENTS[experiment]['levels']:
+        return results
+    results = results.apply(pd.to_numeric, errors='coerce')
+    return results.groupby('desired_increase', sort=True).mean().reset_index()
+
+
+def write_outputs(experiment, parameters, results, output_dir, timestamp):
+    summary = summarize(experiment, results)
+    output_path = os.path.join(output_dir, f"{EXPERIMENTS[experiment]['output']}_{timestamp}.csv")
+    summary.to_csv(output_path, index=False)
+
+    # Save the experiment parameters to a text file
+    param_file_path = os.path.join(output_dir, f'{experiment}_experiment_parameters_{timestamp}.txt')
+    with open(param_file_path, 'w') as f:
+        for key, value in dict(parameters, experiment=experiment, timestamp=timestamp).items():
+            f.write(f'{key}: {value}\n')
+    return output_path
+
+
+def comparison_table(experiment, parameters, results):
+    """
+    One block of the comparison table of a sweep: the averaged results of a grid point with its parameters.
+
+    Level experiments keep one row per desired increase, the VEV one row per voting rule, and the
+    robustness a single row.
+    """
+    if EXPERIMENTS[experiment]['levels']:
+        table = summarize(experiment, results)
+    elif EXPERIMENTS[experiment]['wide']:
+        table = results.apply(pd.to_numeric, errors='coerce').mean().to_frame().T
+    else:
+        table = results.drop(columns='round').groupby('voting_rule', sort=True).mean(numeric_only=True).reset_index()
+    table = table.drop(columns='round', errors='ignore')
+    for position, key in enumerate(('experiment',) + MODEL_PARAMETERS):
+        table.insert(position, key, experiment if key == 'experiment' else parameters[key])
+    return table
+
+
+def load_sweep_file(path):
+    """
+    Read a declarative sweep: a JSON object with the "experiments" to run and a "grid" of parameter values,
+    e.g. {"experiments": ["bribery", "control"], "grid": {"voter_type": ["mallows_model"], "size": [[10, 10], [40, 63]]}}.
+    """
+    with open(path) as f:
+        sweep = json.load(f)
+    grid = {key: [tuple(value) if key == 'size' else value for value in values]
+            for key, values in sweep.get('grid', {}).items()}
+    for key in grid:
+        _check_grid_key(key)
+    return list(sweep.get('experiments', [])), grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run experiments over a grid of parameters")
+    parser.add_argument('experiments', nargs='*', metavar='EXPERIMENT',
+                        help=f"Experiments to run, among {', '.join(sorted(EXPERIMENTS))}")
+    parser.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2,...',
+                        help=f"Values of a parameter to sweep, one of {', '.join(PARAMETERS)}, or size=NxM,...; "
+                             "repeat for a cartesian grid. Unset parameters come from experiments_config.py")
+    parser.add_argument('--sweep', metavar='SWEEP_JSON',
+                        help="JSON file with the experiments and grid of the sweep, see load_sweep_file()")
+    parser.add_argument('--backend', choices=('serial', 'process'), default='process',
+                        help="Run the rounds in this process or in a process pool")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes of the process backend (default: number of CPU cores)")
+    parser.add_argument('--resume', metavar='OUTPUT_DIR',
+                        help="Output directory of an interrupted run to resume; finished rounds are not recomputed")
+    parser.add_argument('--parquet-store', metavar='DIR', default=PARQUET_STORE_DIR,
+                        help="Columnar store the results are also exported to (default: data/experiment_results/parquet)")
+    args = parser.parse_args(argv)
+
+    experiments, grid = load_sweep_file(args.sweep) if args.sweep else ([], {})
+    experiments = list(dict.fromkeys(experiments + args.experiments))
+    grid.update(parse_grid(args.grid))
+    if not experiments:
+        parser.error("no experiment given")
+    for experiment in experiments:
+        if experiment not in EXPERIMENTS:
+            parser.error(f"unknown experiment: {experiment}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    num_workers = 1 if args.backend == 'serial' else args.workers
+    defaults = default_parameters()
+    # One root seed for the whole grid: points with the same setup draw the same random streams
+    defaults['seed'] = np.random.SeedSequence(defaults['seed']).entropy
+    run_dir = args.resume or os.path.join(project_root, 'data', 'experiment_results', f"{'_'.join(experiments)}_{timestamp}")
+
+    sweeps = [(experiment, parameters, os.path.join(run_dir, point_name(parameters, grid), experiment))
+              for parameters in grid_points(grid, defaults) for experiment in experiments]
+    tables = []
+    failed = []
+    run = os.path.basename(os.path.normpath(run_dir))
+    all_results = run_sweep(sweeps, num_workers, ParquetStore(args.parquet_store), run)
+    for (experiment, _, output_dir), (results, parameters, error) in zip(sweeps, all_results):
+        if error is not None:
+            failed.append(output_dir)
+            continue
+        output_path = write_outputs(experiment, parameters, results, output_dir, timestamp)
+        print(f"Results saved to {output_path}")
+        tables.append(comparison_table(experiment, parameters, results))
+
+    # All experiments and grid points side by side
+    if tables:
+        comparison_path = os.path.join(run_dir, f'comparison_{timestamp}.csv')
+        pd.concat(tables, ignore_index=True).to_csv(comparison_path, index=False)
+        print(f"Comparison table saved to {comparison_path}")
+    if failed:
+        print(f"{len(failed)} of {len(sweeps)} sweeps failed, resume with --resume {run_dir} once fixed:")
+        for output_dir in failed:
+            print(f"  {output_dir}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
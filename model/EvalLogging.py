@@ -0,0 +1,81 @@
+import logging
+import time
+
+# Minimum number of seconds between two progress reports
+PROGRESS_INTERVAL = 5.0
+
+
+class EvalLoggerAdapter(logging.LoggerAdapter):
+    """
+    View of the shared evaluation logger with its own minimum level.
+
+    Records below `level` are dropped by this view only, so a quiet EvalMetrics does not silence
+    the other instances of the process. Records that pass are handled by the underlying logger as
+    usual, with the level, handlers and propagation configured by the application.
+    """
+
+    def __init__(self, logger, level=logging.NOTSET):
+        super().__init__(logger, {})
+        self.level = level
+
+    def isEnabledFor(self, level):
+        return level >= self.level and self.logger.isEnabledFor(level)
+
+
+def get_eval_logger(name="EvalMetrics", level=logging.NOTSET):
+    """
+    Get a view of the logger of the evaluation metrics that only passes records at or above `level`.
+
+    Round summaries are logged at INFO, per-project and per-perturbation details at DEBUG, so the
+    inner loops only pay for a level check unless DEBUG is enabled. The logger itself is left as
+    the application configured it, e.g. logging.basicConfig(level=logging.INFO) to see the INFO
+    records on the console.
+    """
+    return EvalLoggerAdapter(logging.getLogger(name), level)
+
+
+class ProgressReporter:
+    """
+    Throttled progress reporting through a logger, replacing nested tqdm bars.
+
+    update() only counts; a line is logged at INFO when at least `min_interval` seconds passed
+    since the previous report, and once when the work is complete. A disabled reporter does
+    nothing but count.
+    """
+
+    def __init__(self, logger, total, desc, unit="it", min_interval=PROGRESS_INTERVAL, enabled=True):
+        self.logger = logger
+        self.total = total
+        self.desc = desc
+        self.unit = unit
+        self.min_interval = min_interval
+        self.enabled = enabled and logger.isEnabledFor(logging.INFO)
+        self.count = 0
+        self._start_time = time.monotonic()
+        self._last_report = self._start_time
+
+    def update(self, n=1):
+        self.count += n
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.min_interval or self.count >= self.total:
+            self._last_report = now
+            elapsed = now - self._start_time
+            rate = self.count / elapsed if elapsed > 0 else float("inf")
+            self.logger.info("%s: %d/%d %s (%.1f %s/s, %.1fs elapsed)",
+                             self.desc, self.count, self.total, self.unit, rate, self.unit, elapsed)
+
+    def iterate(self, iterable):
+        """
+        Yield the items of `iterable`, counting one unit of progress after each.
+        """
+        for item in iterable:
+            yield item
+            self.update(1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
@@ -1,86 +1,142 @@
+import logging
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
-from tqdm import tqdm
 import time
   
 from joblib import Parallel, delayed
+from model.EvalLogging import PROGRESS_INTERVAL, ProgressReporter, get_eval_logger
+from model.IncrementalAllocator import IncrementalAllocator
+from model.RandomStreams import integers
 
 class EvalMetrics:
-    def __init__(self, model):
+    def __init__(self, model, log_level=logging.INFO, progress_interval=PROGRESS_INTERVAL, quiet=False):
+        """
+        Parameters:
+        - model: The VotingModel to evaluate.
+        - log_level: Minimum level of this instance's records; per-project details are logged at DEBUG.
+                     The "EvalMetrics" logger's own level and handlers are left to the application.
+        - progress_interval: Minimum number of seconds between two progress reports.
+        - quiet: If True, this instance only logs warnings and does not report progress.
+        """
         self.model = model
+        self.quiet = quiet
+        self.progress_interval = progress_interval
+        self.logger = get_eval_logger(level=logging.WARNING if quiet else log_level)
 
-    def simulate_bribery_generic(self, voting_rule, target_project, desired_increase):
-        num_voters, num_projects = self.model.voting_matrix.shape
-        original_allocation = self.model.allocate_funds(voting_rule)
-        original_funds = original_allocation[target_project]
-        
-        tolerance=0.00001*self.model.total_op_tokens
-        # Step 2: Calculate the target funds with the desired increase
-        target_funds = original_funds + desired_increase
-        
-        # Step 3: Initialize the bribery cost and make a copy of the voting matrix
-        bribery_cost = 0
-        new_voting_matrix = self.model.voting_matrix.copy()
-        original_matrix = self.model.voting_matrix.copy()  # Save the original matrix
-        max_no_progress_iterations=5
-        no_progress_iterations = 0
-        prev_funds = original_funds
-        #print(f"--- Bribery Simulation Debugging ---")
-        #print(f"Original Funds: {original_funds}")
-        #print(f"Desired Increase: {desired_increase}")
-        #print(f"Target Funds: {target_funds}")  
-
-        try:
-            
-            while True:
-                # Temporarily assign the updated matrix to self.model.voting_matrix
-                self.model.voting_matrix = new_voting_matrix
-                
-                # Recalculate the allocation with the updated voting matrix
-                new_allocation = self.model.allocate_funds(voting_rule)
-                new_funds = new_allocation[target_project]
-                #print(f'{voting_rule}, project {target_project} new_funds: {new_funds}, target_funds: {target_funds}')
-                #print(f"New Funds for project {target_project}: {new_funds}")
-
-                # Check if the new allocation for the target project meets or exceeds the target
-                if new_funds >= target_funds or abs(new_funds - target_funds) < tolerance:
-                    print(f"Target met. Final Funds: {new_funds}, Bribery Cost: {bribery_cost}")
-                    break
+    def _progress(self, total, desc, unit="it"):
+        return ProgressReporter(self.logger, total, desc, unit=unit,
+                                min_interval=self.progress_interval, enabled=not self.quiet)
 
-                
-                if abs(new_funds - prev_funds) < tolerance:
-                    no_progress_iterations += 1
-                    if no_progress_iterations >= max_no_progress_iterations:
-                        # No progress after multiple iterations, set bribery cost to a large value
-                        bribery_cost = self.model.total_op_tokens
-                        print(f"For project {target_project} and voting rule {voting_rule}, the bribery cost is infinite")
-                        break
-                else:
-                    no_progress_iterations = 0  # Reset if there was progress
-                
-                # Add a small, fixed amount of additional votes (say 1% of the original votes)
-                #additional_votes = 0.05 * np.sum(original_matrix[:, target_project])
-                fund_gap = target_funds - new_funds
-                additional_votes = 0.05 * np.sum(original_matrix[:, target_project]) * (fund_gap / target_funds)
-                new_voting_matrix[:, target_project] += additional_votes
+    def simulate_bribery_generic(self, voting_rule, target_project, desired_increase, tolerance=1e-5, max_iterations=60, return_info=False):
+        """
+        Find the minimal bribery cost that raises the allocation of a project by a desired amount.
 
-                #print(f"Additional Votes: {additional_votes}, Bribery Cost So Far: {bribery_cost}")
+        The briber adds the same amount of votes to every voter's ballot for the target project;
+        the cost is that per-voter amount. Rules with a closed-form solver in
+        model.bribery_solvers are solved directly. Otherwise the target allocation is assumed to
+        grow with the added amount, so the minimal cost is bracketed by doubling an initial guess
+        and then bisected.
 
-                prev_funds = new_funds
-                
-                # Accumulate the additional votes into the bribery cost
-                bribery_cost += additional_votes
-                
-        finally:
-            # Step 5: Restore the original voting matrix
-            self.model.voting_matrix = original_matrix
+        Parameters:
+        - voting_rule: The voting rule to attack.
+        - target_project: Index of the project whose allocation should increase.
+        - desired_increase: The absolute increase in funds to reach.
+        - tolerance: Precision of the search, as a fraction of total_op_tokens. It bounds both the
+                     width of the final cost bracket and the shortfall accepted on the target funds.
+        - max_iterations: Maximum number of allocations evaluated while bracketing and while bisecting.
+        - return_info: If True, also return a dictionary with convergence metadata.
 
-       # if bribery_cost == 0 and new_funds < target_funds:
-       #     bribery_cost = self.model.total_op_tokens
-    #    print(f"For project {target_project}, unable to meet target. Bribery cost set to infinity.")
+        Returns:
+        - bribery_cost: The minimal cost found, or total_op_tokens if the target cannot be reached
+                        for less (treated as an infinite cost).
+        - info: (Only if return_info) 'method' ('analytic' or 'bisection'), 'converged', 'reachable',
+                'iterations' (allocations evaluated), 'final_funds' and the final 'bracket' (lower, upper).
+        """
+        original_matrix = np.array(self.model.voting_matrix, dtype=float)
+        max_cost = self.model.total_op_tokens
+
+        solver = self.model.bribery_solvers.get(voting_rule)
+        if solver is not None:
+            bribery_cost = solver(original_matrix, self.model.total_op_tokens, target_project, desired_increase)
+            reachable = bribery_cost < max_cost
+            if not reachable:
+                self.logger.debug("For project %s and voting rule %s, the bribery cost is infinite", target_project, voting_rule)
+                bribery_cost = max_cost
+            if not return_info:
+                return bribery_cost
+            info = {
+                'method': 'analytic',
+                'converged': True,
+                'reachable': reachable,
+                'iterations': 0,
+                'final_funds': None,
+                'bracket': (bribery_cost, bribery_cost),
+            }
+            return bribery_cost, info
+
+        original_allocation = self.model.allocate_funds(voting_rule, original_matrix)
+        original_funds = original_allocation[target_project]
+        target_funds = original_funds + desired_increase
 
-        return bribery_cost
+        cost_tolerance = tolerance * self.model.total_op_tokens
+        funds_tolerance = tolerance * self.model.total_op_tokens
+        iterations = 0
+
+        def funds_with_cost(cost):
+            nonlocal iterations
+            iterations += 1
+            new_voting_matrix = original_matrix.copy()
+            new_voting_matrix[:, target_project] += cost
+            return self.model.allocate_funds(voting_rule, new_voting_matrix)[target_project]
+
+        def target_met(funds):
+            return funds >= target_funds - funds_tolerance
+
+        def result(bribery_cost, converged, reachable, final_funds, bracket):
+            if not return_info:
+                return bribery_cost
+            info = {
+                'method': 'bisection',
+                'converged': converged,
+                'reachable': reachable,
+                'iterations': iterations,
+                'final_funds': final_funds,
+                'bracket': bracket,
+            }
+            return bribery_cost, info
+
+        if target_met(original_funds):
+            return result(0, True, True, original_funds, (0, 0))
+
+        # Step 1: Bracket the cost, starting from the mass that would raise the project's
+        # share of the column sums by the desired relative increase
+        lower, lower_funds = 0, original_funds
+        column_mass = np.sum(original_matrix[:, target_project]) / len(original_matrix)
+        upper = min(max(column_mass * desired_increase / max(target_funds, 1), cost_tolerance), max_cost)
+        upper_funds = funds_with_cost(upper)
+        while not target_met(upper_funds):
+            if upper >= max_cost or iterations >= max_iterations:
+                self.logger.debug("For project %s and voting rule %s, the bribery cost is infinite", target_project, voting_rule)
+                return result(max_cost, upper >= max_cost, False, upper_funds, (upper, max_cost))
+            lower, lower_funds = upper, upper_funds
+            upper = min(2 * upper, max_cost)
+            upper_funds = funds_with_cost(upper)
+
+        # Step 2: Bisect the bracket, keeping the upper end feasible
+        bisection_iterations = 0
+        while upper - lower > cost_tolerance and bisection_iterations < max_iterations:
+            middle = (lower + upper) / 2
+            middle_funds = funds_with_cost(middle)
+            bisection_iterations += 1
+            if target_met(middle_funds):
+                upper, upper_funds = middle, middle_funds
+            else:
+                lower, lower_funds = middle, middle_funds
+
+        converged = upper - lower <= cost_tolerance
+        self.logger.debug("Target met. Final Funds: %s, Bribery Cost: %s", upper_funds, upper)
+        return result(upper, converged, True, upper_funds, (lower, upper))
 
     
     def evaluate_bribery(self, num_rounds=10, desired_increase_percentage=10):
@@ -96,14 +152,13 @@ class EvalMetrics:
             results[f'{voting_rule}_bribery_cost'] = []
 
         # Track the overall progress for the number of rounds
-        with tqdm(total=num_rounds, desc="Bribery Evaluation Progress", unit="round") as round_progress_bar:
+        with self._progress(num_rounds, "Bribery Evaluation Progress", unit="round") as round_progress_bar:
             for i in range(num_rounds):
-                print(f"\n--- Round {i + 1}/{num_rounds} ---")
+                self.logger.info("--- Round %d/%d ---", i + 1, num_rounds)
                 self.model.step()  # Simulate the next round
                 results['desired_increase'].append(desired_increase_percentage)
 
-                # Progress bar for voting rules within a round
-                for voting_rule in tqdm(self.model.voting_rules.keys(), desc=f"Round {i + 1}: Processing Voting Rules", leave=False, unit="rule"):
+                for voting_rule in self.model.voting_rules.keys():
                     original_allocation = self.model.allocate_funds(voting_rule)
                     min_bribery_cost = float('inf')
 
@@ -114,7 +169,7 @@ class EvalMetrics:
                         original_funds = original_allocation[project]
                         # Skip projects with zero allocation
                         if original_funds >= self.model.total_op_tokens:
-                            print(f"Project {project} has zero allocation, bribery cost is infinite")
+                            self.logger.debug("Project %s has zero allocation, bribery cost is infinite", project)
                             bribery_cost=self.model.total_op_tokens
                             absolute_desired_increase = None
 
@@ -126,10 +181,10 @@ class EvalMetrics:
                         elapsed_time = time.time() - start_time
 
                         # Log progress for each project
-                        print(f"[Round {i + 1}] [Project {project + 1}/{self.model.num_projects}] "
-                            f"Voting Rule: {voting_rule}, Absolute Desired Increase: {desired_increase:.4f}, "
-                            f"Bribery Cost: {bribery_cost:.4f}, Elapsed Time: {elapsed_time:.2f}s"
-                            f"Desired Increase Percentage: {desired_increase_percentage:.4f}")
+                        self.logger.debug("[Round %d] [Project %d/%d] Voting Rule: %s, Absolute Desired Increase: %.4f, "
+                                          "Bribery Cost: %.4f, Elapsed Time: %.2fs, Desired Increase Percentage: %.4f",
+                                          i + 1, project + 1, self.model.num_projects, voting_rule, desired_increase,
+                                          bribery_cost, elapsed_time, desired_increase_percentage)
 
                         # Update the minimum bribery cost for the current voting rule
                         if 0<bribery_cost < min_bribery_cost:
@@ -146,7 +201,7 @@ class EvalMetrics:
 
         # Convert results to a DataFrame
         final_results = pd.DataFrame(results)
-        print("\nAll rounds completed. Final results:\n", final_results)
+        self.logger.info("All rounds completed. Final results:\n%s", final_results)
         return final_results
     
     def evaluate_bribery_avg(self, num_rounds=10, desired_increase_percentage=10):
@@ -162,14 +217,13 @@ class EvalMetrics:
             results[f'{voting_rule}_bribery_cost'] = []
 
         # Track the overall progress for the number of rounds
-        with tqdm(total=num_rounds, desc="Bribery Evaluation Progress", unit="round") as round_progress_bar:
+        with self._progress(num_rounds, "Bribery Evaluation Progress", unit="round") as round_progress_bar:
             for i in range(num_rounds):
-                print(f"\n--- Round {i + 1}/{num_rounds} ---")
+                self.logger.info("--- Round %d/%d ---", i + 1, num_rounds)
                 self.model.step()  # Simulate the next round
                 results['desired_increase'].append(desired_increase_percentage)
 
-                # Progress bar for voting rules within a round
-                for voting_rule in tqdm(self.model.voting_rules.keys(), desc=f"Round {i + 1}: Processing Voting Rules", leave=False, unit="rule"):
+                for voting_rule in self.model.voting_rules.keys():
                     original_allocation = self.model.allocate_funds(voting_rule)
                     total_bribery_cost = 0
                     num_valid_projects = 0
@@ -181,7 +235,7 @@ class EvalMetrics:
                         original_funds = original_allocation[project]
                         # Skip projects with zero allocation
                         if original_funds >= self.model.total_op_tokens:
-                            print(f"Project {project} has zero allocation, bribery cost is infinite")
+                            self.logger.debug("Project %s has zero allocation, bribery cost is infinite", project)
                             bribery_cost = self.model.total_op_tokens
                             absolute_desired_increase = None
                         else:
@@ -193,9 +247,10 @@ class EvalMetrics:
                         elapsed_time = time.time() - start_time
 
                         # Log progress for each project
-                        print(f"[Round {i + 1}] [Project {project + 1}/{self.model.num_projects}] "
-                            f"Voting Rule: {voting_rule}, Desired Increase: {desired_increase:.4f}, "
-                            f"Bribery Cost: {bribery_cost:.4f}, Elapsed Time: {elapsed_time:.2f}s")
+                        self.logger.debug("[Round %d] [Project %d/%d] Voting Rule: %s, Desired Increase: %.4f, "
+                                          "Bribery Cost: %.4f, Elapsed Time: %.2fs",
+                                          i + 1, project + 1, self.model.num_projects, voting_rule, desired_increase,
+                                          bribery_cost, elapsed_time)
 
                         # Accumulate total bribery cost for averaging
                         total_bribery_cost += bribery_cost
@@ -213,7 +268,7 @@ class EvalMetrics:
 
         # Convert results to a DataFrame
         final_results = pd.DataFrame(results)
-        print("\nAll rounds completed. Final results:\n", final_results)
+        self.logger.info("All rounds completed. Final results:\n%s", final_results)
         return final_results
 
     
@@ -235,18 +290,17 @@ class EvalMetrics:
             results[f'{voting_rule}_bribery_cost'] = []
 
         # Track the overall progress for the number of rounds
-        with tqdm(total=num_rounds, desc="Bribery Evaluation Progress", unit="round") as round_progress_bar:
+        with self._progress(num_rounds, "Bribery Evaluation Progress", unit="round") as round_progress_bar:
             for i in range(num_rounds):
-                print(f"\n--- Round {i + 1}/{num_rounds} ---")
+                self.logger.info("--- Round %d/%d ---", i + 1, num_rounds)
                 self.model.step()  # Simulate the next round
                 desired_increase_percentage_current_round = desired_increase_percentage
                 results['desired_increase'].append(desired_increase_percentage_current_round)
 
                 # Randomly select a subset of projects to evaluate
-                sampled_projects = np.random.choice(self.model.num_projects, project_sample_size, replace=False)
+                sampled_projects = self.model.rng.choice(self.model.num_projects, project_sample_size, replace=False)
 
-                # Progress bar for voting rules within a round
-                for voting_rule in tqdm(self.model.voting_rules.keys(), desc=f"Round {i + 1}: Processing Voting Rules", leave=False, unit="rule"):
+                for voting_rule in self.model.voting_rules.keys():
                     original_allocation = self.model.allocate_funds(voting_rule)
                     min_bribery_cost = float('inf')
 
@@ -256,7 +310,7 @@ class EvalMetrics:
 
                         original_funds = original_allocation[project]
                         if original_funds == 0:
-                            print(f"Project {project} has zero allocation, skipping...")
+                            self.logger.debug("Project %s has zero allocation, skipping...", project)
                             continue  # Move to the next project
 
 
@@ -267,11 +321,10 @@ class EvalMetrics:
                         elapsed_time = time.time() - start_time
 
                         # Log progress for each project
-                        print(f"[Round {i + 1}] [Project {project + 1}/{self.model.num_projects}] "
-                            f"Voting Rule: {voting_rule}, Desired Increase: {desired_increase:.4f}, "
-                            f"Bribery Cost: {bribery_cost:.4f}, Elapsed Time: {elapsed_time:.2f}s,"
-                            f"Desired Increase: {desired_increase:.4f}, "
-                            f"Desired Increase Percentage: {desired_increase_percentage:.4f}, ")
+                        self.logger.debug("[Round %d] [Project %d/%d] Voting Rule: %s, Desired Increase: %.4f, "
+                                          "Bribery Cost: %.4f, Elapsed Time: %.2fs, Desired Increase Percentage: %.4f",
+                                          i + 1, project + 1, self.model.num_projects, voting_rule, desired_increase,
+                                          bribery_cost, elapsed_time, desired_increase_percentage)
 
                         # Update the minimum bribery cost for the current voting rule
                         if bribery_cost < min_bribery_cost:
@@ -287,7 +340,7 @@ class EvalMetrics:
 
         # Convert results to a DataFrame
         final_results = pd.DataFrame(results)
-        print("\nAll rounds completed. Final results:\n", final_results)
+        self.logger.info("All rounds completed. Final results:\n%s", final_results)
         return final_results
 
         # Gini Index
@@ -329,7 +382,7 @@ class EvalMetrics:
     # Ground Truth Alignment
     def generate_ground_truth(self, num_projects):
         # Mallows model ground truth
-        ground_truth = np.random.multinomial(self.model.total_op_tokens, [1.0/self.model.num_projects] * self.model.num_projects)
+        ground_truth = self.model.rng.multinomial(int(self.model.total_op_tokens), [1.0/self.model.num_projects] * self.model.num_projects)
 
         #ground_truth = np.random.rand(num_projects)
         #ground_truth /= np.sum(ground_truth)
@@ -369,14 +422,14 @@ class EvalMetrics:
     
         # Randomly decide how many projects to change if num_changes is not specified
         if num_changes is None:
-            num_changes = np.random.randint(1, self.model.num_projects + 1)
+            num_changes = integers(self.model.rng, 1, self.model.num_projects + 1)
         
         # Randomly select which projects to change
-        change_indices = np.random.choice(self.model.num_projects, num_changes, replace=False)
+        change_indices = self.model.rng.choice(self.model.num_projects, num_changes, replace=False)
     
         # Iterate over all projects and randomly adjust each vote by a small amount
         for i in change_indices:
-            change_value = np.random.randint(min_change, max_change)
+            change_value = integers(self.model.rng, min_change, max_change)
             new_vote[i] = max(0, new_vote[i] + change_value)  # Ensure vote doesn't go below 0
         
         return new_vote
@@ -402,13 +455,16 @@ class EvalMetrics:
         robustness_results = {f"{method}_distances": [] for method in self.model.voting_rules.keys()}
         robustness_results["changed_vote_l1_distances"] = []
 
+        # Every round perturbs a single ballot of the same base profile, so cache its statistics once per rule
+        allocators = {method: IncrementalAllocator(self.model, method) for method in self.model.voting_rules.keys()}
+
         # Track the overall progress for the number of rounds
-        with tqdm(total=num_rounds, desc="Robustness Evaluation Progress", unit="round") as round_progress_bar:
+        with self._progress(num_rounds, "Robustness Evaluation Progress", unit="round") as round_progress_bar:
             for round_num in range(num_rounds):
-                print(f"\n--- Round {round_num + 1}/{num_rounds} ---")
+                self.logger.info("--- Round %d/%d ---", round_num + 1, num_rounds)
 
                 # Randomly select a voter and change their vote
-                voter_idx = np.random.randint(0, self.model.num_voters)
+                voter_idx = integers(self.model.rng, 0, self.model.num_voters)
                 original_vote = self.model.voting_matrix[voter_idx].copy()
                 new_vote = self.random_change_vote(original_vote, min_change_param, max_change_param)
 
@@ -416,21 +472,16 @@ class EvalMetrics:
                 change_in_vote = np.sum(np.abs(new_vote - original_vote))
                 robustness_results["changed_vote_l1_distances"].append(change_in_vote)
 
-                print(f"[Round {round_num + 1}] Voter {voter_idx} changed their vote (L1 change: {change_in_vote:.4f})")
+                self.logger.debug("[Round %d] Voter %d changed their vote (L1 change: %.4f)", round_num + 1, voter_idx, change_in_vote)
 
                 # Apply the same vote change across all voting rules
-                for method in tqdm(self.model.voting_rules.keys(), desc=f"Processing Voting Rules (Round {round_num + 1})", leave=False, unit="rule"):
+                for method in self.model.voting_rules.keys():
                     # Original outcome
-                    original_outcome = self.model.allocate_funds(method)
-                    
-                    # Create a new voting matrix with the modified vote
-                    new_voting_matrix = self.model.voting_matrix.copy()
-                    new_voting_matrix[voter_idx] = new_vote
-                    self.model.voting_matrix = new_voting_matrix
+                    original_outcome = allocators[method].allocation()
 
                     # Calculate the outcome with the modified vote
                     start_time = time.time()
-                    new_outcome = self.model.allocate_funds(method)
+                    new_outcome = allocators[method].allocate_with_ballot(voter_idx, new_vote)
                     elapsed_time = time.time() - start_time
 
                     # Calculate the L1 distance between the original and new outcomes
@@ -438,10 +489,7 @@ class EvalMetrics:
                     robustness_results[f"{method}_distances"].append(distance)
 
                     # Log the result for the current method
-                    print(f"[Round {round_num + 1}] [Voting Rule: {method}] L1 Distance: {distance:.4f} (Time: {elapsed_time:.2f}s)")
-
-                    # Restore the original voting matrix for the next round
-                    self.model.voting_matrix[voter_idx] = original_vote
+                    self.logger.debug("[Round %d] [Voting Rule: %s] L1 Distance: %.4f (Time: %.2fs)", round_num + 1, method, distance, elapsed_time)
 
                 # Update the round progress bar after completing all voting rules
                 round_progress_bar.update(1)
@@ -450,7 +498,7 @@ class EvalMetrics:
         robustness_df = pd.DataFrame(robustness_results)
         robustness_df["round"] = robustness_df.index + 1
 
-        print("\nAll rounds completed. Final results:\n", robustness_df)
+        self.logger.info("All rounds completed. Final results:\n%s", robustness_df)
         return robustness_df
 
     # Social Welfare
@@ -489,56 +537,84 @@ class EvalMetrics:
                 results[f'{voting_rule}_egalitarian_score'].append(egalitarian_score)
         return pd.DataFrame(results)
 
-    def simulate_voter_addition(self, project, voting_rule, desired_increase_percentage):
-        num_voters, num_projects = self.model.voting_matrix.shape
-        original_allocation = self.model.allocate_funds(voting_rule)
-        original_funds = original_allocation[project]
+    def simulate_voter_addition(self, project, voting_rule, desired_increase_percentage, allocator=None):
+        """
+        Count the voters giving all their tokens to a project that must be added to raise its
+        allocation by a desired percentage, adding at most half the number of voters.
+
+        Rules with an incremental form evaluate every number of added voters in one batched call.
+        Other rules are re-run on full profiles, so the smallest sufficient number is found by
+        bisection, assuming the project's allocation grows with the number of added voters.
+
+        Parameters:
+        - project: Index of the project to favour.
+        - voting_rule: The voting rule to attack.
+        - desired_increase_percentage: The percentage increase in funding to be achieved.
+        - allocator: (Optional) IncrementalAllocator of the current profile for this rule.
+
+        Returns:
+        - addition_cost: The number of voters added, or np.inf if the target cannot be reached.
+        """
+        if allocator is None:
+            allocator = IncrementalAllocator(self.model, voting_rule)
+        num_voters = allocator.num_voters
+        original_funds = allocator.allocation()[project]
         if original_funds<=0.1:
             desired_increase = 0.01 * self.model.total_op_tokens * desired_increase_percentage/100
         else:
             desired_increase = original_funds * desired_increase_percentage/100
         target_funds = original_funds + desired_increase
-        added_voters = 0
-
-        #print(f"Voting Rule: {voting_rule}: Original Funds for Project {project}: {original_funds}")
-        #print(f"Voting Rule: {voting_rule}: Target Funds for Project {project}: {target_funds}")
-
-        max_additional_voters = num_voters * 0.5  # Limit to avoid infinite loop
-
-        # Create a copy of the original voting matrix to work with
-        potential_voting_matrix = self.model.voting_matrix.copy()
-
-        while added_voters < max_additional_voters:
-            new_voter = np.zeros(num_projects)
-            new_voter[project] = self.model.total_op_tokens  # New voters give all their votes to the target project
-
-            # Update the voting matrix cumulatively with the new voter
-            potential_voting_matrix = np.vstack([potential_voting_matrix, new_voter])
-
-            # Temporarily replace the voting matrix
-            original_matrix = self.model.voting_matrix
-            self.model.voting_matrix = potential_voting_matrix
-
-            try:
-                new_allocation = self.model.allocate_funds(voting_rule)
-                new_funds = new_allocation[project]
-
-                #print(f"Voting Rule: {voting_rule}: New Funds for Project {project} after adding {added_voters + 1} voters: {new_funds}")
 
-                if new_funds >= target_funds:
-                    return added_voters + 1  # Number of voters added
-            finally:
-                # Always restore the original voting matrix
-                self.model.voting_matrix = original_matrix
+        max_additional_voters = int(np.ceil(num_voters * 0.5))  # Limit to avoid infinite loop
+        if max_additional_voters == 0:
+            return np.inf
+
+        new_voter = np.zeros(self.model.num_projects)
+        new_voter[project] = self.model.total_op_tokens  # New voters give all their votes to the target project
+
+        if allocator.has_incremental_form():
+            counts = np.arange(1, max_additional_voters + 1)
+            new_funds = allocator.allocate_with_added_ballots(new_voter, counts)[:, project]
+            reached = np.flatnonzero(new_funds >= target_funds)
+            return int(counts[reached[0]]) if len(reached) else np.inf  # Number of voters added
+
+        def target_met(count):
+            return allocator.allocate_with_added_ballots(new_voter, [count])[0, project] >= target_funds
+
+        if not target_met(max_additional_voters):
+            return np.inf  # If no solution is found
+        lower, upper = 0, max_additional_voters
+        while upper - lower > 1:
+            middle = (lower + upper) // 2
+            if target_met(middle):
+                upper = middle
+            else:
+                lower = middle
+        return upper
+
+    def simulate_voter_removal(self, project, voting_rule, desired_increase_percentage, allocator=None):
+        """
+        Count the voters that must be removed to raise the allocation of a project by a desired percentage.
 
-            added_voters += 1
+        Voters are removed in increasing order of their vote for the project (ties by voter index),
+        and each removal updates the statistics of an IncrementalAllocator instead of rebuilding
+        the profile.
 
-        return np.inf  # If no solution is found
+        Parameters:
+        - project: Index of the project to favour.
+        - voting_rule: The voting rule to attack.
+        - desired_increase_percentage: The percentage increase in funding to be achieved.
+        - allocator: (Optional) IncrementalAllocator of the current profile for this rule; it is
+                     copied, so one allocator can be shared across projects.
 
-    def simulate_voter_removal(self, project, voting_rule, desired_increase_percentage):
-        num_voters, num_projects = self.model.voting_matrix.shape
-        original_allocation = self.model.allocate_funds(voting_rule)
-        original_funds = original_allocation[project]
+        Returns:
+        - removal_cost: The number of voters removed, or np.inf if the target cannot be reached.
+        """
+        if allocator is None:
+            allocator = IncrementalAllocator(self.model, voting_rule)
+        allocator = allocator.copy()
+        num_voters = allocator.num_voters
+        original_funds = allocator.allocation()[project]
 
         if original_funds<=0.1:
             desired_increase = 0.01 * self.model.total_op_tokens * desired_increase_percentage/100
@@ -546,52 +622,23 @@ class EvalMetrics:
             desired_increase = original_funds * desired_increase_percentage/100
         target_funds = original_funds + desired_increase
 
-        # Make a copy of the voting matrix to modify during the simulation
-        potential_voting_matrix = self.model.voting_matrix.copy()
-
-        current_num_voters = num_voters
-
-        #print(f"Voting Rule: {voting_rule} Original Funds for Project {project}: {original_funds}")
-        #print(f"Voting Rule: {voting_rule} Target Funds for Project {project}: {target_funds}")
-
-        for i in range(num_voters):
-            if current_num_voters == 0:
-                break  # No voters left to remove
-
-            # Sort voters by their current influence after each iteration?? reverse the list
-            #current_votes = potential_voting_matrix[:, project]
-            #voters_sorted_by_influence = np.argsort(current_votes)[::-1]
-            current_votes = potential_voting_matrix[:, project]
-            voters_sorted_by_influence = np.argsort(current_votes)
-
-            # Remove the most influential voter for other projects
-            potential_voting_matrix = np.delete(potential_voting_matrix, voters_sorted_by_influence[0], axis=0)
-            current_num_voters -= 1
+        # The removal order only depends on the project column, so it is computed once
+        removal_order = np.argsort(allocator.voting_matrix[:, project], kind='stable')
 
+        for i, voter in enumerate(removal_order):
             # **Exit early if voting matrix is empty**:
-            if potential_voting_matrix.shape[0] == 0:
-                print("No voters left in the matrix. Cannot proceed.")
+            if i == num_voters - 1:
+                self.logger.debug("No voters left in the matrix. Cannot proceed.")
                 return np.inf  # Exit early as no more voters are left to manipulate the project funds
 
             # Recalculate the allocation after voter removal
-            original_matrix = self.model.voting_matrix
-            self.model.voting_matrix = potential_voting_matrix
+            new_funds = allocator.remove_voter(voter)[project]
 
-            try:
-                new_allocation = self.model.allocate_funds(voting_rule)
-                new_funds = new_allocation[project]
+            if new_funds >= target_funds:
+                return i + 1  # Number of voters removed
 
-                #print(f"Voting Rule: {voting_rule}: New Funds for Project {project} after removing {i + 1} voters: {new_funds}")
-
-                if new_funds >= target_funds:
-                    return i + 1  # Number of voters removed
-                
-                if new_funds <= original_funds * 0.5:
-                    break
-
-            finally:
-                # Restore the original voting matrix
-                self.model.voting_matrix = original_matrix
+            if new_funds <= original_funds * 0.5:
+                break
 
         return np.inf  # Not possible to achieve the desired increase by removing voters
 
@@ -605,49 +652,52 @@ class EvalMetrics:
         # Initialize columns for removal and addition costs for each voting rule
         for voting_rule in self.model.voting_rules.keys():
             results[f'{voting_rule}_min_removal_cost'] = []
-            #results[f'{voting_rule}_min_addition_cost'] = []
+            results[f'{voting_rule}_min_addition_cost'] = []
 
         num_iterations = num_rounds * self.model.num_voters * self.model.num_projects
 
         # Outer loop for the number of rounds
         for round_num in range(num_rounds):
-            print(f"\n--- Round {round_num + 1}/{num_rounds} ---")
+            self.logger.info("--- Round %d/%d ---", round_num + 1, num_rounds)
             self.model.step()  # Simulate the next round
             results['desired_increase'].append(desired_increase)
 
             # Track progress for each round
-            for voting_rule in tqdm(self.model.voting_rules.keys(), desc=f"Processing Voting Rules (Round {round_num + 1})", unit="rule"):
+            rule_progress = self._progress(len(self.model.voting_rules), f"Processing Voting Rules (Round {round_num + 1})", unit="rule")
+            for voting_rule in rule_progress.iterate(self.model.voting_rules.keys()):
                 min_removal_cost = np.inf
                 min_addition_cost = np.inf
                 removal_possible = False
+                allocator = IncrementalAllocator(self.model, voting_rule)
 
                 # Track progress for each project
                 for project in range(self.model.num_projects):
                     project_start_time = time.time()
 
                     # Calculate the cost to remove voters
-                    removal_cost = self.simulate_voter_removal(project, voting_rule, desired_increase)
+                    removal_cost = self.simulate_voter_removal(project, voting_rule, desired_increase, allocator)
                     if removal_cost < np.inf:
                         removal_possible = True
                         min_removal_cost = min(min_removal_cost, removal_cost)
 
                     # Calculate the cost to add voters
-                    #addition_cost = self.simulate_voter_addition(project, voting_rule, desired_increase)
-                    #min_addition_cost = min(min_addition_cost, addition_cost)
+                    addition_cost = self.simulate_voter_addition(project, voting_rule, desired_increase, allocator)
+                    min_addition_cost = min(min_addition_cost, addition_cost)
 
                     # Log progress for each voter-project combination
                     elapsed_time = time.time() - project_start_time
-                    print(f"[Round {round_num + 1}] [Project {project + 1}/{self.model.num_projects}] "
-                        f"Voting Rule: {voting_rule}, Removal Cost: {removal_cost:.4f}, ")
-                        #f"Addition Cost: {addition_cost:.4f}, Time: {elapsed_time:.2f}s")
+                    self.logger.debug("[Round %d] [Project %d/%d] Voting Rule: %s, Removal Cost: %.4f, "
+                                      "Addition Cost: %.4f, Time: %.2fs",
+                                      round_num + 1, project + 1, self.model.num_projects, voting_rule,
+                                      removal_cost, addition_cost, elapsed_time)
 
                 # Append the removal and addition costs for the current voting rule
                 results[f'{voting_rule}_min_removal_cost'].append(min_removal_cost if removal_possible else "Not Possible")
-                #results[f'{voting_rule}_min_addition_cost'].append(min_addition_cost)
+                results[f'{voting_rule}_min_addition_cost'].append(min_addition_cost)
 
         # Convert results to a DataFrame
         final_results = pd.DataFrame(results)
-        print("\nAll rounds completed. Final results:\n", final_results)
+        self.logger.info("All rounds completed. Final results:\n%s", final_results)
         return final_results
     
     def evaluate_control_optimized(self, num_rounds=10, desired_increase=20, project_sample_size=10):
@@ -664,53 +714,56 @@ class EvalMetrics:
         # Initialize columns for removal and addition costs for each voting rule
         for voting_rule in self.model.voting_rules.keys():
             results[f'{voting_rule}_min_removal_cost'] = []
-            #results[f'{voting_rule}_min_addition_cost'] = []
+            results[f'{voting_rule}_min_addition_cost'] = []
 
         # Outer loop for the number of rounds
         for round_num in range(num_rounds):
-            print(f"\n--- Round {round_num + 1}/{num_rounds} ---")
+            self.logger.info("--- Round %d/%d ---", round_num + 1, num_rounds)
             self.model.step()  # Simulate the next round
             results['desired_increase'].append(desired_increase)
 
             # Randomly select a subset of projects to evaluate
-            sampled_projects = np.random.choice(self.model.num_projects, project_sample_size, replace=False)
+            sampled_projects = self.model.rng.choice(self.model.num_projects, project_sample_size, replace=False)
 
             # Track progress for each round
-            for voting_rule in tqdm(self.model.voting_rules.keys(), desc=f"Processing Voting Rules (Round {round_num + 1})", unit="rule"):
+            rule_progress = self._progress(len(self.model.voting_rules), f"Processing Voting Rules (Round {round_num + 1})", unit="rule")
+            for voting_rule in rule_progress.iterate(self.model.voting_rules.keys()):
                 min_removal_cost = np.inf
                 min_addition_cost = np.inf
                 removal_possible = False
+                allocator = IncrementalAllocator(self.model, voting_rule)
 
                 # Track progress for each sampled project
                 for project in sampled_projects:
                     project_start_time = time.time()
 
                     # Calculate the cost to remove voters
-                    removal_cost = self.simulate_voter_removal(project, voting_rule, desired_increase)
+                    removal_cost = self.simulate_voter_removal(project, voting_rule, desired_increase, allocator)
                     if removal_cost < np.inf:
                         removal_possible = True
                         min_removal_cost = min(min_removal_cost, removal_cost)
 
                     # Calculate the cost to add voters
-                    #addition_cost = self.simulate_voter_addition(project, voting_rule, desired_increase)
-                    #min_addition_cost = min(min_addition_cost, addition_cost)
+                    addition_cost = self.simulate_voter_addition(project, voting_rule, desired_increase, allocator)
+                    min_addition_cost = min(min_addition_cost, addition_cost)
 
                     # Log progress for each voter-project combination
                     elapsed_time = time.time() - project_start_time
-                    print(f"[Round {round_num + 1}] [Project {project + 1}/{self.model.num_projects}] "
-                        f"Voting Rule: {voting_rule}, Removal Cost: {removal_cost:.4f}, ")
-                        #f"Addition Cost: {addition_cost:.4f}, Time: {elapsed_time:.2f}s")
+                    self.logger.debug("[Round %d] [Project %d/%d] Voting Rule: %s, Removal Cost: %.4f, "
+                                      "Addition Cost: %.4f, Time: %.2fs",
+                                      round_num + 1, project + 1, self.model.num_projects, voting_rule,
+                                      removal_cost, addition_cost, elapsed_time)
 
                 # Append the removal and addition costs for the current voting rule
                 results[f'{voting_rule}_min_removal_cost'].append(min_removal_cost if removal_possible else "Not Possible")
-                #results[f'{voting_rule}_min_addition_cost'].append(min_addition_cost)
+                results[f'{voting_rule}_min_addition_cost'].append(min_addition_cost)
 
         # Convert results to a DataFrame
         final_results = pd.DataFrame(results)
-        print("\nAll rounds completed. Final results:\n", final_results)
+        self.logger.info("All rounds completed. Final results:\n%s", final_results)
         return final_results
         
-    def evaluate_vev(self, num_rounds=100, r_min=90, r_max=99):
+    def evaluate_vev(self, num_rounds=100, r_min=90, r_max=99, max_batch_size=4096):
         """
         Evaluate the Voter Extractable Value (VEV) for a given voting rule.
 
@@ -718,6 +771,7 @@ class EvalMetrics:
         - num_rounds: Number of instances to compute VEV across different vote profiles.
         - r_min: Minimum percentage allocation to the specific project (default: 90%).
         - r_max: Maximum percentage allocation to the specific project (default: 99%).
+        - max_batch_size: Maximum number of manipulated ballots evaluated in one batched call.
 
         Returns:
         - VEV_results: DataFrame containing the VEV for each instance and voting rule.
@@ -738,53 +792,10 @@ class EvalMetrics:
             self.model.step()  # Simulate a new vote profile
 
             for voting_rule in self.model.voting_rules.keys():
-                max_vev = float('-inf')  # Track the maximum VEV for this rule
-
-                project_max_vev = float('-inf')
-                project_max_new_allocation = float('-inf')
-                project_max_original_allocation  = float('-inf')
-
-                # Get the original allocation using the voting rule
-                original_allocation = self.model.allocate_funds(voting_rule)
-                #project_original_allocation = original_allocation[project]
-                num_iterations = self.model.num_voters * self.model.num_projects * 5  
-                with tqdm(total=num_iterations) as pbar:
-                    for voter in range(self.model.num_voters):
-                        for project in range(self.model.num_projects):
-                            project_original_allocation = original_allocation[project]
-                            # Iterate through r values from r_min to r_max (90% to 99%)
-                            for r in r_values:
-                                # Create a modified vote for this voter and project
-                                start_time = time.time()
-                                modified_vote_matrix = self.model.voting_matrix.copy()
-                                modified_vote_matrix[voter] = self.modify_vote(voter, project, r)
-                                
-                                # Apply the modified vote profile to get a new allocation
-                                new_allocation = self.model.allocate_funds(voting_rule, modified_vote_matrix)
-                                project_new_allocation=new_allocation[project]
-                                
-                                # Calculate the L1 distance between original and new allocation
-                                l1_distance = np.sum(np.abs(original_allocation - new_allocation))
-                                project_allocation_difference=project_new_allocation-project_original_allocation
-
-                                elapsed_time = time.time() - start_time
-                                print(f"[Round {instance}] [Voter {voter}/{self.model.num_voters}] [Project {project}/{self.model.num_projects}] "
-                                f"r={r:.2f} L1={l1_distance:.4f} Allocation Diff={project_allocation_difference:.4f} "
-                                f"Max VEV={max_vev:.4f} Elapsed Time: {elapsed_time:.2f}s")
-
-
-                                # Progress bar update
-                                pbar.update(1)
-                                # Update the maximum VEV if this is the largest skewness
-                                if l1_distance > max_vev:
-                                    max_vev = l1_distance
-                                if project_allocation_difference > project_max_vev:
-                                    project_max_vev = project_allocation_difference
-                                    project_max_new_allocation = project_new_allocation
-                                    project_max_original_allocation = project_original_allocation
-                                #if project_new_allocation > project_max_new_allocation:
-                                #    project_max_new_allocation = project_new_allocation
-                                #    project_max_original_allocation = project_original_allocation
+                voters = range(self.model.num_voters)
+                projects = range(self.model.num_projects)
+                max_vev, project_max_vev, project_max_original_allocation, project_max_new_allocation = \
+                    self._vev_for_rule(voting_rule, voters, projects, r_values, max_batch_size)
 
                 # Log the maximum VEV for this instance and voting rule
                 results['round'].append(instance)  # Add round number dynamically
@@ -801,6 +812,59 @@ class EvalMetrics:
         return VEV_results
 
 
+    def _vev_for_rule(self, voting_rule, voters, projects, r_values, max_batch_size=4096):
+        """
+        Evaluate every (voter, project, r) manipulation of the current profile under one voting rule.
+
+        The manipulated ballots do not depend on the voter, so they are built once as a
+        (projects x r_values) stack and evaluated for each voter in batched calls of at most
+        max_batch_size ballots.
+
+        Returns:
+        - max_vev: Largest L1 distance between the original and a manipulated allocation.
+        - project_max_vev: Largest gain of the favoured project.
+        - project_max_original_allocation: Original allocation of the project with the largest gain.
+        - project_max_new_allocation: Manipulated allocation of the project with the largest gain.
+        """
+        allocator = IncrementalAllocator(self.model, voting_rule)
+        original_allocation = allocator.allocation()
+        projects = np.asarray(projects)
+
+        ballots = self.modify_votes(projects, r_values).reshape(-1, self.model.num_projects)
+        # Favoured project of every row of `ballots`
+        favoured_projects = np.repeat(projects, len(r_values))
+
+        max_l1 = np.full(len(voters), -np.inf)
+        max_gain = np.full(len(voters), -np.inf)
+        max_gain_allocation = np.zeros(len(voters))
+        max_gain_project = np.zeros(len(voters), dtype=int)
+        voter_progress = self._progress(len(voters), f"VEV {voting_rule}", unit="voter")
+        for i, voter in enumerate(voter_progress.iterate(voters)):
+            for start in range(0, len(ballots), max_batch_size):
+                stop = start + max_batch_size
+                new_allocations = allocator.allocate_with_ballot(voter, ballots[start:stop])
+                l1_distances = np.sum(np.abs(original_allocation - new_allocations), axis=-1)
+                new_project_allocations = new_allocations[np.arange(len(new_allocations)), favoured_projects[start:stop]]
+                gains = new_project_allocations - original_allocation[favoured_projects[start:stop]]
+
+                # NaN allocations never count as a maximum, as in a sequential scan with `>`
+                l1_distances = np.where(np.isnan(l1_distances), -np.inf, l1_distances)
+                gains = np.where(np.isnan(gains), -np.inf, gains)
+
+                max_l1[i] = max(max_l1[i], np.max(l1_distances))
+                # Keep the first maximum, as the sequential scan over (project, r) did
+                best = np.argmax(gains)
+                if gains[best] > max_gain[i]:
+                    max_gain[i] = gains[best]
+                    max_gain_allocation[i] = new_project_allocations[best]
+                    max_gain_project[i] = favoured_projects[start + best]
+
+        best_voter = np.argmax(max_gain)
+        project_max_vev = max_gain[best_voter]
+        project_max_original_allocation = original_allocation[max_gain_project[best_voter]]
+        project_max_new_allocation = max_gain_allocation[best_voter]
+        return np.max(max_l1), project_max_vev, project_max_original_allocation, project_max_new_allocation
+
     def modify_vote(self, voter, project, r):
         """
         Modify the vote of voter `i` by allocating r% of their funds to project `k`.
@@ -814,23 +878,32 @@ class EvalMetrics:
         Returns:
         - modified_vote: The new vote profile for the voter with modified allocations.
         """
-        total_funds = self.model.total_op_tokens
-        num_projects = self.model.num_projects
+        return self.modify_votes([project], [r])[0, 0]
 
-        # Allocate r% of funds to the selected project
-        modified_vote = np.zeros(num_projects)
-        modified_vote[project] = r * total_funds
+    def modify_votes(self, projects, r_values):
+        """
+        Build the modified votes of modify_vote for every combination of projects and r values at once.
+
+        Parameters:
+        - projects: Indices of the projects where the majority of the funds will go.
+        - r_values: The percentages of total funds allocated to the selected project.
 
-        # Distribute the remaining (1 - r)% equally across the other projects
-        remaining_funds = (1 - r) * total_funds
-        for other_project in range(num_projects):
-            if other_project != project:
-                modified_vote[other_project] = remaining_funds / (num_projects - 1)
+        Returns:
+        - modified_votes: Array shaped (projects, r_values, num_projects); entry [i, j] is the vote
+                          giving r_values[j] of the funds to projects[i].
+        """
+        total_funds = self.model.total_op_tokens
+        num_projects = self.model.num_projects
+        projects = np.asarray(projects)[:, np.newaxis, np.newaxis]
+        r_values = np.asarray(r_values, dtype=float)[np.newaxis, :, np.newaxis]
 
-        return modified_vote
+        # r% of the funds to the selected project, the remaining (1 - r)% equally across the other projects
+        is_selected = np.arange(num_projects) == projects
+        remaining_share = (1 - r_values) * total_funds / (num_projects - 1)
+        return np.where(is_selected, r_values * total_funds, remaining_share)
 
 
-    def evaluate_vev_optimized(self, num_rounds=100, r_min=90, r_max=99, num_sample_voters=10, num_sample_projects=10):
+    def evaluate_vev_optimized(self, num_rounds=100, r_min=90, r_max=99, num_sample_voters=10, num_sample_projects=10, max_batch_size=4096):
         """
         Evaluate the Voter Extractable Value (VEV) for a given voting rule, randomly selecting a subset of voters and projects.
 
@@ -840,6 +913,7 @@ class EvalMetrics:
         - r_max: Maximum percentage allocation to the specific project (default: 99%).
         - num_sample_voters: Number of voters to randomly select per round.
         - num_sample_projects: Number of projects to randomly select per round.
+        - max_batch_size: Maximum number of manipulated ballots evaluated in one batched call.
 
         Returns:
         - VEV_results: DataFrame containing the VEV for each instance and voting rule.
@@ -860,64 +934,22 @@ class EvalMetrics:
             self.model.step()  # Simulate a new vote profile
 
             for voting_rule in self.model.voting_rules.keys():
-                max_vev = float('-inf')  # Track the maximum VEV for this rule
-                project_max_vev = float('-inf')
-                project_max_new_allocation = float('-inf')
-                project_max_original_allocation = float('-inf')
+                # Randomly select a subset of voters and projects
+                selected_voters = self.model.rng.choice(self.model.num_voters, num_sample_voters, replace=False)
+                selected_projects = self.model.rng.choice(self.model.num_projects, num_sample_projects, replace=False)
 
-                # Get the original allocation using the voting rule
-                original_allocation = self.model.allocate_funds(voting_rule)
+                max_vev, project_max_vev, project_max_original_allocation, project_max_new_allocation = \
+                    self._vev_for_rule(voting_rule, selected_voters, selected_projects, r_values, max_batch_size)
 
-                # Randomly select a subset of voters and projects
-                selected_voters = np.random.choice(self.model.num_voters, num_sample_voters, replace=False)
-                selected_projects = np.random.choice(self.model.num_projects, num_sample_projects, replace=False)
-
-                num_iterations = num_sample_voters * num_sample_projects * len(r_values)
-                with tqdm(total=num_iterations) as pbar:
-                    for voter in selected_voters:
-                        for project in selected_projects:
-                            project_original_allocation = original_allocation[project]
-
-                            # Iterate through r values from r_min to r_max
-                            for r in r_values:
-                                # Create a modified vote for this voter and project
-                                start_time = time.time()
-                                modified_vote_matrix = self.model.voting_matrix.copy()
-                                modified_vote_matrix[voter] = self.modify_vote(voter, project, r)
-
-                                # Apply the modified vote profile to get a new allocation
-                                new_allocation = self.model.allocate_funds(voting_rule, modified_vote_matrix)
-                                project_new_allocation = new_allocation[project]
-
-                                # Calculate the L1 distance between original and new allocation
-                                l1_distance = np.sum(np.abs(original_allocation - new_allocation))
-                                project_allocation_difference = project_new_allocation - project_original_allocation
-
-                                elapsed_time = time.time() - start_time
-                                print(f"[Round {instance}] [Voter {voter}] [Project {project}] "
-                                    f"r={r:.2f} L1={l1_distance:.4f} Allocation Diff={project_allocation_difference:.4f} "
-                                    f"Max VEV={max_vev:.4f} Elapsed Time: {elapsed_time:.2f}s")
-
-                                # Progress bar update
-                                pbar.update(1)
-
-                                # Update the maximum VEV if this is the largest skewness
-                                if l1_distance > max_vev:
-                                    max_vev = l1_distance
-                                if project_allocation_difference > project_max_vev:
-                                    project_max_vev = project_allocation_difference
-                                    project_max_new_allocation = project_new_allocation
-                                    project_max_original_allocation = project_original_allocation
-
-                    # Log the maximum VEV for this instance and voting rule
-                    results['round'].append(instance)  # Add round number dynamically
-                    results['voting_rule'].append(voting_rule)  # Add the voting rule
-                    results['max_vev'].append(max_vev)  # Add the maximum VEV
-                    results['project_max_vev'].append(project_max_vev)
-                    results['project_max_vev_percentage'].append(project_max_vev / self.model.total_op_tokens)
-                    results['project_max_original_allocation'].append(project_max_original_allocation)
-                    results['project_max_new_allocation'].append(project_max_new_allocation)
-                    results['project_max_allocation_percentage'].append(project_max_new_allocation / self.model.total_op_tokens)
+                # Log the maximum VEV for this instance and voting rule
+                results['round'].append(instance)  # Add round number dynamically
+                results['voting_rule'].append(voting_rule)  # Add the voting rule
+                results['max_vev'].append(max_vev)  # Add the maximum VEV
+                results['project_max_vev'].append(project_max_vev)
+                results['project_max_vev_percentage'].append(project_max_vev / self.model.total_op_tokens)
+                results['project_max_original_allocation'].append(project_max_original_allocation)
+                results['project_max_new_allocation'].append(project_max_new_allocation)
+                results['project_max_allocation_percentage'].append(project_max_new_allocation / self.model.total_op_tokens)
 
         # Create a DataFrame to store results
         VEV_results = pd.DataFrame(results)
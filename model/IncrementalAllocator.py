@@ -0,0 +1,271 @@
+import copy
+import numpy as np
+from model.OrderStatisticIndex import OrderStatisticIndex
+from model.VotingRules import (
+    VotingRules,
+    capped_median_thresholds,
+    _cap_and_redistribute_k1,
+    _capped_median_allocation,
+    _median_allocation,
+)
+
+# Upper bound on the memory used by a stack of full profiles when a rule has no incremental form
+MAX_BATCH_BYTES = 64 * 1024 ** 2
+
+
+class IncrementalAllocator:
+    """
+    Answers "what if voter i's ballot were v" queries against a base profile without
+    rebuilding the full (voters x projects) computation.
+
+    Per-project sufficient statistics of the profile are cached once:
+    - r2_mean: column sums, so a ballot replacement is an O(m) update.
+    - r1_quadratic: column sums of square roots, also O(m).
+    - r3_median: an OrderStatisticIndex over the votes, giving non-zero medians and counts.
+    - r4_capped_median / normalized_median: an OrderStatisticIndex over the K1-capped ballots.
+      K1 capping acts on each ballot independently, so only the replaced ballot is recapped.
+
+    For the median rules, the median of a column after replacing one entry is read from the
+    neighbouring order statistics of the sorted column, which makes a query O(m) once the
+    position of the voter's current ballot is known (O(n m), cached per voter). Any other rule
+    falls back to evaluating full profiles, batched when the rule is one of the VotingRules kernels.
+
+    Voters can also be removed from the profile. Removed voters are masked out rather than
+    deleted, so voter indices stay those of the original matrix. Adding k copies of a ballot is
+    answered for many values of k at once from the same statistics.
+    """
+
+    def __init__(self, model, voting_rule, voting_matrix=None, max_batch_bytes=MAX_BATCH_BYTES):
+        if voting_rule not in model.voting_rules:
+            raise ValueError(f"Unknown aggregation method: {voting_rule}")
+
+        self.model = model
+        self.voting_rule = voting_rule
+        self.total_op_tokens = model.total_op_tokens
+        self.max_batch_bytes = max_batch_bytes
+        if voting_matrix is None:
+            voting_matrix = model.voting_matrix
+        self.voting_matrix = np.array(voting_matrix, dtype=float)
+        # copy() shares the voting matrix; replace_ballot copies it before the first write
+        self._owns_voting_matrix = True
+        self.num_voters, self.num_projects = self.voting_matrix.shape
+        self._active_voters = np.ones(self.num_voters, dtype=bool)
+
+        if voting_rule == 'r2_mean':
+            self._column_sums = np.sum(self.voting_matrix, axis=0)
+        elif voting_rule == 'r1_quadratic':
+            self._column_sums = np.sum(np.sqrt(self.voting_matrix), axis=0)
+        elif voting_rule == 'r3_median':
+            self._index = OrderStatisticIndex(self.voting_matrix)
+        elif voting_rule in ('r4_capped_median', 'normalized_median'):
+            self._thresholds = capped_median_thresholds(voting_rule, self.total_op_tokens)
+            self._index = OrderStatisticIndex(self._index_values(self.voting_matrix))
+
+        self._ranks = {}
+        self._allocation = self.model.allocate_funds(voting_rule, self.voting_matrix)
+
+    def allocation(self):
+        """
+        Allocation of the current profile.
+        """
+        return self._allocation
+
+    def allocate_with_ballot(self, voter, ballots):
+        """
+        Allocate funds with the ballot of `voter` replaced, leaving the profile unchanged.
+
+        Parameters:
+        - voter: Index of the voter whose ballot is replaced.
+        - ballots: The replacement ballot shaped (projects,), or several alternatives shaped (batch, projects).
+
+        Returns:
+        - allocation: The allocation shaped (projects,) or (batch, projects).
+        """
+        ballots = np.asarray(ballots, dtype=float)
+        single_ballot = ballots.ndim == 1
+        ballots = np.atleast_2d(ballots)
+
+        if self.voting_rule == 'r2_mean':
+            column_sums = self._column_sums - self.voting_matrix[voter] + ballots
+            allocation = self._mean_allocation(column_sums)
+        elif self.voting_rule == 'r1_quadratic':
+            column_sums = self._column_sums - np.sqrt(self.voting_matrix[voter]) + np.sqrt(ballots)
+            allocation = self._quadratic_allocation(column_sums)
+        elif self.voting_rule == 'r3_median':
+            median_votes, votes_count = self._index.non_zero_median_with_replacement(
+                self._rank(voter), self.voting_matrix[voter], ballots)
+            allocation = _median_allocation(median_votes, votes_count, self.total_op_tokens)
+        elif self.voting_rule in ('r4_capped_median', 'normalized_median'):
+            median_scores = self._index.median_with_replacement(self._rank(voter), self._index_values(ballots))
+            allocation = self._capped_median_allocation(median_scores)
+        else:
+            allocation = self._allocate_full_profiles(voter, ballots)
+
+        return allocation[0] if single_ballot else allocation
+
+    def replace_ballot(self, voter, ballot):
+        """
+        Replace the ballot of `voter` in the profile and update the cached statistics.
+
+        Returns:
+        - allocation: The allocation of the updated profile.
+        """
+        ballot = np.asarray(ballot, dtype=float)
+        old_ballot = self.voting_matrix[voter].copy()
+        if not self._owns_voting_matrix:
+            self.voting_matrix = self.voting_matrix.copy()
+            self._owns_voting_matrix = True
+        self.voting_matrix[voter] = ballot
+        self._ranks = {}
+
+        if self.voting_rule == 'r2_mean':
+            self._column_sums = self._column_sums - old_ballot + ballot
+            self._allocation = self._mean_allocation(self._column_sums)
+        elif self.voting_rule == 'r1_quadratic':
+            self._column_sums = self._column_sums - np.sqrt(old_ballot) + np.sqrt(ballot)
+            self._allocation = self._quadratic_allocation(self._column_sums)
+        elif self.voting_rule == 'r3_median':
+            self._index.replace(old_ballot, ballot)
+            self._allocation = self.model.allocate_funds(self.voting_rule, self._index)
+        elif self.voting_rule in ('r4_capped_median', 'normalized_median'):
+            self._index.replace(self._index_values(old_ballot), self._index_values(ballot))
+            self._allocation = self.model.allocate_funds(self.voting_rule, self._index)
+        else:
+            self._allocation = self.model.allocate_funds(self.voting_rule, self.active_voting_matrix())
+
+        return self._allocation
+
+    def remove_voter(self, voter):
+        """
+        Remove `voter` from the profile and update the cached statistics.
+
+        Returns:
+        - allocation: The allocation of the remaining profile.
+        """
+        if not self._active_voters[voter]:
+            raise ValueError(f"Voter {voter} was already removed")
+        if self.num_voters == 1:
+            raise ValueError("Cannot remove the last voter of the profile")
+
+        ballot = self.voting_matrix[voter]
+        self._active_voters[voter] = False
+        self.num_voters -= 1
+        self._ranks = {}
+
+        if self.voting_rule == 'r2_mean':
+            self._column_sums = self._column_sums - ballot
+            self._allocation = self._mean_allocation(self._column_sums)
+        elif self.voting_rule == 'r1_quadratic':
+            self._column_sums = self._column_sums - np.sqrt(ballot)
+            self._allocation = self._quadratic_allocation(self._column_sums)
+        elif self.voting_rule in ('r3_median', 'r4_capped_median', 'normalized_median'):
+            self._index.remove(self._index_values(ballot))
+            self._allocation = self.model.allocate_funds(self.voting_rule, self._index)
+        else:
+            self._allocation = self.model.allocate_funds(self.voting_rule, self.active_voting_matrix())
+
+        return self._allocation
+
+    def allocate_with_added_ballots(self, ballot, counts):
+        """
+        Allocate funds after adding `counts[i]` voters who all cast `ballot`, leaving the profile unchanged.
+
+        Parameters:
+        - ballot: The ballot of the added voters, shaped (projects,).
+        - counts: Numbers of added voters to evaluate.
+
+        Returns:
+        - allocations: Array shaped (len(counts), projects).
+        """
+        ballot = np.asarray(ballot, dtype=float)
+        counts = np.asarray(counts, dtype=int)
+        added = counts[:, np.newaxis]
+
+        if self.voting_rule == 'r2_mean':
+            return self._mean_allocation(self._column_sums + added * ballot)
+        if self.voting_rule == 'r1_quadratic':
+            return self._quadratic_allocation(self._column_sums + added * np.sqrt(ballot))
+        if self.voting_rule == 'r3_median':
+            median_votes, votes_count = self._index.non_zero_median_with_copies(ballot, counts)
+            return _median_allocation(median_votes, votes_count, self.total_op_tokens)
+        if self.voting_rule in ('r4_capped_median', 'normalized_median'):
+            median_scores = self._index.median_with_copies(self._index_values(ballot), counts)
+            return self._capped_median_allocation(median_scores)
+
+        voting_matrix = self.active_voting_matrix()
+        allocations = []
+        for count in counts:
+            added_voters = np.repeat(ballot[np.newaxis], count, axis=0)
+            allocations.append(self.model.allocate_funds(self.voting_rule, np.vstack([voting_matrix, added_voters])))
+        return np.array(allocations).reshape(len(counts), self.num_projects)
+
+    def has_incremental_form(self):
+        """
+        Whether the rule is answered from cached statistics rather than by re-running it on full profiles.
+        """
+        return self.voting_rule in ('r1_quadratic', 'r2_mean', 'r3_median', 'r4_capped_median', 'normalized_median')
+
+    def active_voting_matrix(self):
+        """
+        Ballots of the voters still in the profile.
+        """
+        return self.voting_matrix[self._active_voters]
+
+    def copy(self):
+        """
+        Independent copy, cheaper than rebuilding the cached statistics. The voting matrix is shared
+        until either allocator replaces a ballot, so a copy only removing voters costs O(n + m).
+        """
+        allocator = copy.copy(self)
+        self._owns_voting_matrix = allocator._owns_voting_matrix = False
+        allocator._active_voters = self._active_voters.copy()
+        allocator._ranks = dict(self._ranks)
+        if hasattr(self, '_index'):
+            # Index updates rebind its arrays, so a shallow copy is independent
+            allocator._index = copy.copy(self._index)
+        return allocator
+
+    def _rank(self, voter):
+        # Position of the voter's current entries in the index, cached until the profile changes
+        if voter not in self._ranks:
+            self._ranks[voter] = self._index.rank(self._index_values(self.voting_matrix[voter]))
+        return self._ranks[voter]
+
+    def _index_values(self, ballots):
+        # Values kept in the order-statistic index for the given ballots
+        if self.voting_rule == 'r3_median':
+            return ballots
+        return _cap_and_redistribute_k1(ballots, self._thresholds[0])
+
+    def _mean_allocation(self, column_sums):
+        mean_votes = column_sums / self.num_voters
+        return mean_votes / np.sum(mean_votes, axis=-1, keepdims=True) * self.total_op_tokens
+
+    def _quadratic_allocation(self, column_sums):
+        return (column_sums / np.sum(column_sums, axis=-1, keepdims=True)) * self.total_op_tokens
+
+    def _capped_median_allocation(self, median_scores):
+        K1, K2, K3 = self._thresholds
+        return _capped_median_allocation(median_scores, self.total_op_tokens, K2, K3)
+
+    def _allocate_full_profiles(self, voter, ballots):
+        voting_rule = self.model.voting_rules[self.voting_rule]
+        # Only the VotingRules kernels are known to accept (batch, voters, projects) stacks
+        voting_matrix = self.active_voting_matrix()
+        # Row of the voter among the remaining voters
+        voter = np.count_nonzero(self._active_voters[:voter])
+        if not isinstance(getattr(voting_rule, '__self__', None), VotingRules):
+            allocations = []
+            for ballot in ballots:
+                voting_matrix[voter] = ballot
+                allocations.append(self.model.allocate_funds(self.voting_rule, voting_matrix))
+            return np.array(allocations)
+
+        chunk_size = max(1, int(self.max_batch_bytes // voting_matrix.nbytes))
+        allocations = []
+        for start in range(0, len(ballots), chunk_size):
+            chunk = ballots[start:start + chunk_size]
+            profiles = np.repeat(voting_matrix[np.newaxis], len(chunk), axis=0)
+            profiles[:, voter] = chunk
+            allocations.append(self.model.allocate_funds(self.voting_rule, profiles))
+        return np.concatenate(allocations, axis=0)
@@ -0,0 +1,220 @@
+import numpy as np
+
+
+class OrderStatisticIndex:
+    """
+    Per-project sorted index of a voting matrix.
+
+    Every column of the (voters x projects) matrix is kept sorted, so medians, non-zero medians and
+    non-zero counts are read with index arithmetic instead of a full np.median over the matrix.
+    Adding or replacing one entry per project shifts each sorted column by one position in a
+    single vectorized O(n m) select, without re-sorting. Hypothetical replacements can also be
+    queried without modifying the index, in O(m) per candidate once the position of the replaced
+    entry is known.
+
+    Removals do not move the sorted columns: the sorted positions of the r removed entries are
+    kept per project, and kth() skips them in O(r m). The columns are compacted in O(n m) once r
+    exceeds sqrt(n), or before an operation that needs them compact (rank, insert and the
+    hypothetical queries), so a run of removals costs O(sqrt(n) m) per removal amortized.
+
+    Votes are non-negative, so the zero votes sit at the start of every sorted column and the
+    non-zero votes of a project are its last non_zero_count() entries.
+    """
+
+    def __init__(self, voting_matrix):
+        voting_matrix = np.asarray(voting_matrix, dtype=float)
+        self.sorted_values = np.sort(voting_matrix, axis=0)
+        self.num_entries, self.num_projects = self.sorted_values.shape
+        self._zero_count = np.count_nonzero(self.sorted_values <= 0, axis=0)
+        self._project_index = np.arange(self.num_projects)
+        self._padded_values = None
+        # Sorted positions of the removed entries, ascending per project, shaped (removed, projects)
+        self._removed_positions = np.empty((0, self.num_projects), dtype=np.int64)
+
+    @property
+    def shape(self):
+        """
+        Shape (voters, projects) of the indexed matrix.
+        """
+        return self.num_entries, self.num_projects
+
+    def rank(self, values):
+        """
+        Position of `values` (one per project) in the sorted columns, i.e. the number of entries below it.
+        """
+        self._compact()
+        return np.count_nonzero(self.sorted_values < values, axis=0)
+
+    def insert(self, values):
+        """
+        Add one entry per project.
+        """
+        values = np.asarray(values, dtype=float)
+        position = self.rank(values)  # compacts the columns
+        row = np.arange(self.num_entries + 1)[:, np.newaxis]
+        # Entries below the insertion position stay in place and the ones above move up by one
+        padding = np.zeros((1, self.num_projects))
+        kept_values = np.concatenate([self.sorted_values, padding], axis=0)
+        shifted_values = np.concatenate([padding, self.sorted_values], axis=0)
+        self.sorted_values = np.where(row < position, kept_values, np.where(row == position, values, shifted_values))
+        self._padded_values = None
+        self.num_entries += 1
+        self._zero_count = self._zero_count + (values <= 0)
+
+    def remove(self, values):
+        """
+        Remove one entry per project; `values` must be present in the corresponding columns.
+        """
+        values = np.asarray(values, dtype=float)
+        # First position of the value in the sorted column, past copies of it that were already removed
+        position = np.count_nonzero(self.sorted_values < values, axis=0)
+        for removed_position in self._removed_positions:
+            position = position + (removed_position == position)
+        self._removed_positions = np.sort(np.concatenate([self._removed_positions, position[np.newaxis]]), axis=0)
+        self._padded_values = None
+        self.num_entries -= 1
+        self._zero_count = self._zero_count - (values <= 0)
+        if len(self._removed_positions) ** 2 > len(self.sorted_values):
+            self._compact()
+
+    def _compact(self):
+        # Drop the removed entries from the sorted columns
+        if len(self._removed_positions) == 0:
+            return
+        kept = np.ones(self.sorted_values.shape, dtype=bool)
+        kept[self._removed_positions, self._project_index] = False
+        self.sorted_values = self.sorted_values.T[kept.T].reshape(self.num_projects, self.num_entries).T
+        self._removed_positions = np.empty((0, self.num_projects), dtype=np.int64)
+        self._padded_values = None
+
+    def replace(self, old_values, new_values):
+        """
+        Replace one entry per project, e.g. a voter's ballot.
+        """
+        self.remove(old_values)
+        self.insert(new_values)
+
+    def kth(self, k):
+        """
+        k-th smallest entry (0-based) of every project; `k` is a scalar or one index per project.
+        """
+        position = np.broadcast_to(k, (self.num_projects,))
+        # Every removed entry at or below the position shifts it up by one
+        for removed_position in self._removed_positions:
+            position = position + (removed_position <= position)
+        return self.sorted_values[position, self._project_index]
+
+    def median(self):
+        """
+        Per-project median of all entries, as np.median(voting_matrix, axis=0).
+        """
+        return (self.kth((self.num_entries - 1) // 2) + self.kth(self.num_entries // 2)) / 2
+
+    def capped_median(self, cap):
+        """
+        Per-project median of the entries capped at `cap`, as np.median(np.minimum(voting_matrix, cap), axis=0).
+        """
+        lower = np.minimum(self.kth((self.num_entries - 1) // 2), cap)
+        upper = np.minimum(self.kth(self.num_entries // 2), cap)
+        return (lower + upper) / 2
+
+    def non_zero_count(self):
+        """
+        Per-project number of non-zero entries.
+        """
+        return self.num_entries - self._zero_count
+
+    def non_zero_median(self):
+        """
+        Per-project median of the non-zero entries, 0 for projects without any.
+        """
+        votes_count = self.non_zero_count()
+        lower_index = np.minimum(self._zero_count + np.maximum(votes_count - 1, 0) // 2, self.num_entries - 1)
+        upper_index = np.minimum(self._zero_count + votes_count // 2, self.num_entries - 1)
+        median_votes = (self.kth(lower_index) + self.kth(upper_index)) / 2
+        return np.where(votes_count > 0, median_votes, 0)
+
+    def kth_with_replacement(self, removed_rank, values, k):
+        """
+        k-th smallest entry of every project after replacing the entry at `removed_rank` by `values`,
+        without modifying the index.
+
+        With S' the sorted column without the removed entry, the k-th entry after inserting v is
+        clip(v, S'[k - 1], S'[k]), and S'[i] is S[i] before the removed position and S[i + 1] after it.
+        Shapes: removed_rank (projects,); values and k broadcast to (batch, projects).
+        """
+        self._compact()
+        if self._padded_values is None:
+            self._padded_values = np.concatenate([
+                np.full((1, self.num_projects), -np.inf),
+                self.sorted_values,
+                np.full((2, self.num_projects), np.inf),
+            ], axis=0)
+
+        def without_removed(i):
+            # S'[i], with S'[-1] = -inf and S'[i] = inf past the end
+            return self._padded_values[i + 1 + (i >= removed_rank), self._project_index]
+
+        k = np.broadcast_to(k, np.shape(values))
+        return np.clip(values, without_removed(k - 1), without_removed(k))
+
+    def median_with_replacement(self, removed_rank, values):
+        """
+        Per-project median after replacing the entry at `removed_rank` by each row of `values`.
+        """
+        lower = self.kth_with_replacement(removed_rank, values, (self.num_entries - 1) // 2)
+        upper = self.kth_with_replacement(removed_rank, values, self.num_entries // 2)
+        return (lower + upper) / 2
+
+    def non_zero_median_with_replacement(self, removed_rank, removed_values, values):
+        """
+        Per-project non-zero median and non-zero count after replacing the entry at `removed_rank`
+        (whose values are `removed_values`) by each row of `values`.
+        """
+        zero_count = self._zero_count - (removed_values <= 0) + (values <= 0)
+        votes_count = self.num_entries - zero_count
+        lower_index = zero_count + np.maximum(votes_count - 1, 0) // 2
+        upper_index = np.minimum(zero_count + votes_count // 2, self.num_entries - 1)
+        lower = self.kth_with_replacement(removed_rank, values, lower_index)
+        upper = self.kth_with_replacement(removed_rank, values, upper_index)
+        return np.where(votes_count > 0, (lower + upper) / 2, 0), votes_count
+
+    def kth_with_copies(self, values, copies, k):
+        """
+        k-th smallest entry of every project after adding `copies` copies of `values`, without
+        modifying the index.
+
+        With p the position of v in the sorted column, the extended column is S[:p], then the
+        copies of v, then S[p:]. Shapes: values (projects,); copies (batch,); k broadcasts to
+        (batch, projects).
+        """
+        position = self.rank(values)  # compacts the columns
+        copies = np.asarray(copies)[:, np.newaxis]
+        k = np.broadcast_to(k, (len(copies), self.num_projects))
+        last = max(self.num_entries - 1, 0)
+        below = self.sorted_values[np.clip(k, 0, last), self._project_index]
+        above = self.sorted_values[np.clip(k - copies, 0, last), self._project_index]
+        return np.where(k < position, below, np.where(k < position + copies, values, above))
+
+    def median_with_copies(self, values, copies):
+        """
+        Per-project median after adding each number of `copies` of `values`.
+        """
+        num_entries = self.num_entries + np.asarray(copies)[:, np.newaxis]
+        lower = self.kth_with_copies(values, copies, (num_entries - 1) // 2)
+        upper = self.kth_with_copies(values, copies, num_entries // 2)
+        return (lower + upper) / 2
+
+    def non_zero_median_with_copies(self, values, copies):
+        """
+        Per-project non-zero median and non-zero count after adding each number of `copies` of `values`.
+        """
+        copies_column = np.asarray(copies)[:, np.newaxis]
+        num_entries = self.num_entries + copies_column
+        zero_count = self._zero_count + copies_column * (values <= 0)
+        votes_count = num_entries - zero_count
+        lower_index = np.minimum(zero_count + np.maximum(votes_count - 1, 0) // 2, num_entries - 1)
+        upper_index = np.minimum(zero_count + votes_count // 2, num_entries - 1)
+        lower = self.kth_with_copies(values, copies, lower_index)
+        upper = self.kth_with_copies(values, copies, upper_index)
+        return np.where(votes_count > 0, (lower + upper) / 2, 0), votes_count
@@ -0,0 +1,36 @@
+import numpy as np
+
+# Random streams are either a np.random.Generator or, when no seed is given, the np.random
+# module itself, so unseeded runs keep drawing from the global stream as before. Both expose
+# dirichlet, multinomial, binomial, choice, uniform and random; only the integer draw differs.
+
+
+def make_rng(seed=None):
+    """
+    Random stream for a seed: a Generator for an int or SeedSequence seed, the global np.random
+    stream for None.
+    """
+    if seed is None:
+        return np.random
+    return np.random.default_rng(seed)
+
+
+def integers(rng, low, high=None, size=None):
+    """
+    Random integers in [low, high) from either kind of random stream.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, size=size)
+    return rng.randint(low, high, size=size)
+
+
+def child_seed(root, index):
+    """
+    Child `index` of `root`, the same SeedSequence as root.spawn(n)[index] on a fresh root, but
+    independent of how many children were spawned before; a resumed run gets the seeds of the
+    original run for the same tasks.
+
+    SeedSequence children never overlap, so parallel tasks seeded with different children never
+    repeat each other's draws, whichever worker runs them. Record root.entropy to reproduce a run.
+    """
+    return np.random.SeedSequence(root.entropy, spawn_key=tuple(root.spawn_key) + (index,))
@@ -4,17 +4,31 @@ import numpy as np
 import pandas as pd
 from agents.VoterAgent import VoterAgent
 from agents.ProjectAgent import ProjectAgent
-from model.VotingRules import VotingRules
+from model.VotingRules import VotingRules, BRIBERY_SOLVERS
+from model.OrderStatisticIndex import OrderStatisticIndex
+from model.RandomStreams import make_rng
 
 class VotingModel(Model):
-    def __init__(self, voter_type, num_voters, num_projects, total_op_tokens):
+    def __new__(cls, *args, **kwargs):
+        # Mesa seeds model.random from the `seed` keyword, which must be a plain hashable seed.
+        # `seed` is keyword-only in __init__, so it always reaches Mesa here.
+        if isinstance(kwargs.get('seed'), np.random.SeedSequence):
+            kwargs['seed'] = kwargs['seed'].entropy
+        return super().__new__(cls, *args, **kwargs)
+
+    def __init__(self, voter_type, num_voters, num_projects, total_op_tokens, dtype=None, *, seed=None):
         self.num_voters = num_voters
         self.num_projects = num_projects
         self.total_op_tokens = total_op_tokens
         self.schedule = RandomActivation(self)
         self.voter_type = voter_type
 
-        self.voter = VoterAgent(0, self, voter_type, num_projects, total_op_tokens)
+        # Seed (int or np.random.SeedSequence) of the model's random stream; None uses the global np.random stream
+        self.seed = seed
+        self.rng = make_rng(seed)
+
+        # dtype (e.g. np.float32) of the generated voting matrices, None keeps the generator's own
+        self.voter = VoterAgent(0, self, voter_type, num_projects, total_op_tokens, dtype=dtype, rng=self.rng)
 
         #self.voters = [VoterAgent(i, self, voter_type, num_projects, total_op_tokens) for i in range(num_voters)]
         self.projects = [ProjectAgent(i, self) for i in range(num_projects)]
@@ -28,6 +42,8 @@ class VotingModel(Model):
 
         # Initialize the voting rules
         self.voting_rules = self._discover_voting_rules()
+        # Closed-form bribery cost solvers, keyed by voting rule
+        self.bribery_solvers = dict(BRIBERY_SOLVERS)
 
     def _discover_voting_rules(self):
         voting_rules = {}
@@ -70,9 +86,13 @@ class VotingModel(Model):
         - method: The voting rule method to be used (e.g., 'r1_quadratic', 'r2_mean', etc.).
         - voting_matrix: (Optional) A custom voting matrix to use for fund allocation. 
                         If None, the default self.voting_matrix will be used.
+                        A stack of profiles shaped (batch, voters, projects) is evaluated
+                        in a single vectorized pass. The median rules also accept an
+                        OrderStatisticIndex of the profile.
 
         Returns:
-        - allocation: The fund allocation according to the voting rule.
+        - allocation: The fund allocation according to the voting rule, shaped (projects,)
+                      for a single profile or (batch, projects) for a stack of profiles.
         """
         # Use the provided voting_matrix if available, otherwise use the default self.voting_matrix
         if voting_matrix is None:
@@ -81,6 +101,11 @@ class VotingModel(Model):
         # Check if the method exists in the voting rules
         if method not in self.voting_rules:
             raise ValueError(f"Unknown aggregation method: {method}")
+
+        if not isinstance(voting_matrix, OrderStatisticIndex):
+            voting_matrix = np.asarray(voting_matrix)
+        if len(voting_matrix.shape) not in (2, 3):
+            raise ValueError(f"Invalid voting_matrix shape. Expected (voters, projects) or (batch, voters, projects) got {voting_matrix.shape}")
         
         #if voting_matrix.shape != (self.num_voters, self.num_projects):
         #    raise ValueError(f"Invalid voting_matrix shape. Expected {(self.num_voters, self.num_projects)} got {voting_matrix.shape}")
@@ -90,12 +115,40 @@ class VotingModel(Model):
         return self.voting_rules[method](voting_matrix, self.total_op_tokens, self.num_voters)
 
 
-    def add_voting_rule(self, name, func):
+    def reseed(self, seed):
+        """
+        Replace the random stream of the model and its voter generator, e.g. at the start of a parallel task.
+        """
+        self.seed = seed
+        self.rng = make_rng(seed)
+        self.voter.rng = self.rng
+
+    def add_voting_rule(self, name, func, bribery_solver=None):
+        """
+        Register the voting rule `name`, replacing any rule of the same name.
+
+        A closed-form bribery solver registered under that name belongs to the replaced rule and
+        is dropped; pass `bribery_solver` (see add_bribery_solver) to register one for `func`.
+        """
         self.voting_rules[name] = func
+        self.bribery_solvers.pop(name, None)
+        if bribery_solver is not None:
+            self.add_bribery_solver(name, bribery_solver)
 
     def remove_voting_rule(self, name):
         if name in self.voting_rules:
             del self.voting_rules[name]
+        if name in self.bribery_solvers:
+            del self.bribery_solvers[name]
+
+    def add_bribery_solver(self, name, func):
+        """
+        Register a closed-form bribery cost for the voting rule `name`.
+
+        `func(voting_matrix, total_op_tokens, target_project, desired_increase)` must return the
+        minimal amount to add to every voter's vote for the target project, or np.inf.
+        """
+        self.bribery_solvers[name] = func
 
     def compile_fund_allocations(self):
         num_voters, num_projects = self.voting_matrix.shape
@@ -1,238 +1,373 @@
 import numpy as np
+from model.OrderStatisticIndex import OrderStatisticIndex
 
 QUORUM = 17
 MIN_AMOUNT=1500
+# Excess (in tokens) below which the K2 redistribution of the capped median rules is skipped
+K2_TOLERANCE = 1e-6
 
 
+# Every rule accepts either a single profile shaped (voters, projects) or a stack of
+# profiles shaped (batch, voters, projects), and returns (projects,) or (batch, projects)
+# allocations respectively. Reductions therefore always run over axis=-2 (voters) and
+# normalizations over axis=-1 (projects).
+# The median rules also accept an OrderStatisticIndex of a single profile in place of the
+# voting matrix, and then read their medians and non-zero counts from the index.
 class VotingRules:
 
     def r1_quadratic(self, voting_matrix, total_funds, num_voters):
-        num_voters, num_projects = voting_matrix.shape
+        num_voters, num_projects = voting_matrix.shape[-2:]
         true_vote = np.sqrt(voting_matrix)
-        sum_sqrt_tokens_per_project = np.sum(true_vote, axis=0)
-        funds_allocated = (sum_sqrt_tokens_per_project / np.sum(sum_sqrt_tokens_per_project)) * total_funds
+        sum_sqrt_tokens_per_project = np.sum(true_vote, axis=-2)
+        funds_allocated = (sum_sqrt_tokens_per_project / np.sum(sum_sqrt_tokens_per_project, axis=-1, keepdims=True)) * total_funds
         return funds_allocated
 
     def r2_mean(self, voting_matrix, total_op_tokens, num_voters):
-        num_voters, num_projects = voting_matrix.shape
-        total_votes = np.sum(voting_matrix, axis=0)
+        num_voters, num_projects = voting_matrix.shape[-2:]
+        total_votes = np.sum(voting_matrix, axis=-2)
         mean_votes = total_votes / num_voters
-        return mean_votes / np.sum(mean_votes) * total_op_tokens
+        return mean_votes / np.sum(mean_votes, axis=-1, keepdims=True) * total_op_tokens
 
     def r3_median(self, voting_matrix, total_op_tokens, num_voters):
-        num_voters, num_projects = voting_matrix.shape
-        # Step 1: Calculate the median, ignoring zeros
-        def non_zero_median(column):
-            non_zero_values = column[column > 0]
-            if len(non_zero_values) == 0:
-                return 0
-            return np.median(non_zero_values)
-        
-        median_votes = np.apply_along_axis(non_zero_median, 0, voting_matrix)
-
-        votes_count = np.apply_along_axis(lambda column: np.count_nonzero(column > 0), 0, voting_matrix)
-
-        # Step 3: Apply eligibility criteria (median >= MIN_AMOUNT and votes_count >= quorum)
-        eligible_projects = (median_votes >= MIN_AMOUNT) & (votes_count >= QUORUM)
-        
-        eligible_median_votes = median_votes * eligible_projects
-        
-        # Step 3: Scale the eligible median votes to match the total_op_tokens
-        if np.sum(eligible_median_votes) == 0:
-            return np.zeros_like(eligible_median_votes)  # Avoid division by zero
-        
-        scaled_allocations = (eligible_median_votes / np.sum(eligible_median_votes)) * total_op_tokens
-        
-        return scaled_allocations
+        num_voters, num_projects = voting_matrix.shape[-2:]
+        # Step 1: Calculate the median and the number of votes per project, ignoring zeros
+        if isinstance(voting_matrix, OrderStatisticIndex):
+            median_votes, votes_count = voting_matrix.non_zero_median(), voting_matrix.non_zero_count()
+        else:
+            median_votes, votes_count = _non_zero_median_and_count(voting_matrix)
+
+        return _median_allocation(median_votes, votes_count, total_op_tokens)
     
     
     def r4_capped_median(self,voting_matrix, total_op_tokens, num_voters):
-        num_voters, num_projects = voting_matrix.shape
-
-        # K1 is the maximum number of tokens a single voter can allocate to a single project before redistribution is triggered.
-        K1 = 500000#0.05*total_op_tokens
-        # K2 is the maximum median allocation a project can receive before redistribution is triggered.
-        K2 =  500000#0.05*total_op_tokens
-        # K3 is the minimum allocation required for a project to receive funding; projects below this threshold are eliminated, and their funds are redistributed.
-        K3 = 1000#0.0001*total_op_tokens
-
-        # Step 1: Cap at K1 for each voter
-        capped_scores = np.minimum(voting_matrix, K1)
-        excess_scores = np.maximum(0, voting_matrix - K1)
-
-        redistributed_scores = capped_scores.copy()
-        
-        for i in range(num_voters):
-            uncapped_projects = capped_scores[i] < K1
-            
-            if np.any(uncapped_projects):
-                uncapped_project_indices = np.where(uncapped_projects)[0]
-                relevant_capped_scores = capped_scores[i, uncapped_project_indices]
-                relevant_excess_scores = excess_scores[i, uncapped_project_indices]
-                
-                if np.sum(relevant_capped_scores) > 0:
-                    proportionate_excess = (relevant_excess_scores * relevant_capped_scores) / np.sum(relevant_capped_scores)
-                    redistributed_scores[i, uncapped_project_indices] += proportionate_excess
+        num_voters, num_projects = voting_matrix.shape[-2:]
 
-        # Step 2: Calculate medians
-        median_scores = np.median(redistributed_scores, axis=0)
-
-        # Step 3: Cap at K2 and redistribute
-        capped_median_scores = np.minimum(median_scores, K2)
-        excess_median = np.maximum(0, median_scores - K2)
-
-        # Total excess after capping at K2
-        total_excess_median = np.sum(excess_median)
-
-        # Step 4: Redistribution of excess from K2 to only projects below K2
-        eligible_projects = capped_median_scores < K2
-        redistributed_median_scores = capped_median_scores.copy()
-
-        while total_excess_median > 0:
-            eligible_for_redistribution = capped_median_scores < K2  # Only redistribute to projects under K2
-            
-            if np.any(eligible_for_redistribution) and np.sum(capped_median_scores[eligible_for_redistribution]) > 0:
-                # Redistribute excess only to eligible projects
-                redistributed_median_scores[eligible_for_redistribution] += (
-                    (total_excess_median * capped_median_scores[eligible_for_redistribution]) 
-                    / np.sum(capped_median_scores[eligible_for_redistribution])
-                )
-
-            # Recalculate excess after redistribution
-            total_excess_median = np.sum(np.maximum(0, redistributed_median_scores - K2))
-            redistributed_median_scores = np.minimum(redistributed_median_scores, K2)  # Cap at K2 again
-
-        # Step 5: Normalize to the total budget
-        final_scores = redistributed_median_scores / np.sum(redistributed_median_scores) * total_op_tokens
-
-        # Step 6: Eliminate projects with allocation below K3 and redistribute
-        low_allocation_projects = final_scores < K3
-        if np.any(low_allocation_projects):
-            redistributed_amount = np.sum(final_scores[low_allocation_projects])
-            eligible_for_redistribution = (final_scores >= K3) & (final_scores < K2)  # Only redistribute to projects below K2
-            if np.any(eligible_for_redistribution) and np.sum(final_scores[eligible_for_redistribution]) > 0:
-                final_scores[eligible_for_redistribution] += (redistributed_amount * final_scores[eligible_for_redistribution]) / np.sum(final_scores[eligible_for_redistribution])
-            final_scores[low_allocation_projects] = 0
-
-        # Step 7: Final normalization and capping
-        total_allocated = np.sum(final_scores)
-        if total_allocated > 0:
-            final_allocation = final_scores / total_allocated * total_op_tokens
-        else:
-            final_allocation = final_scores
+        K1, K2, K3 = capped_median_thresholds('r4_capped_median', total_op_tokens)
 
-        return np.minimum(final_allocation, K2)  # Ensure final capping
+        return _capped_median(voting_matrix, total_op_tokens, K1, K2, K3)
     
     
     def normalized_median(self,voting_matrix, total_op_tokens, num_voters):
-        num_voters, num_projects = voting_matrix.shape
-
-        # K1 is the maximum number of tokens a single voter can allocate to a single project before redistribution is triggered.
-        K1 = total_op_tokens#0.05*total_op_tokens
-        # K2 is the maximum median allocation a project can receive before redistribution is triggered.
-        K2 = total_op_tokens#0.05*total_op_tokens
-        # K3 is the minimum allocation required for a project to receive funding; projects below this threshold are eliminated, and their funds are redistributed.
-        K3 = 0#0.0001*total_op_tokens
+        num_voters, num_projects = voting_matrix.shape[-2:]
 
-        # Step 1: Cap at K1 for each voter
-        capped_scores = np.minimum(voting_matrix, K1)
-        excess_scores = np.maximum(0, voting_matrix - K1)
-
-        redistributed_scores = capped_scores.copy()
-        
-        for i in range(num_voters):
-            uncapped_projects = capped_scores[i] < K1
-            
-            if np.any(uncapped_projects):
-                uncapped_project_indices = np.where(uncapped_projects)[0]
-                relevant_capped_scores = capped_scores[i, uncapped_project_indices]
-                relevant_excess_scores = excess_scores[i, uncapped_project_indices]
-                
-                if np.sum(relevant_capped_scores) > 0:
-                    proportionate_excess = (relevant_excess_scores * relevant_capped_scores) / np.sum(relevant_capped_scores)
-                    redistributed_scores[i, uncapped_project_indices] += proportionate_excess
+        K1, K2, K3 = capped_median_thresholds('normalized_median', total_op_tokens)
 
-        # Step 2: Calculate medians
-        median_scores = np.median(redistributed_scores, axis=0)
-
-        # Step 3: Cap at K2 and redistribute
-        capped_median_scores = np.minimum(median_scores, K2)
-        excess_median = np.maximum(0, median_scores - K2)
-
-        # Total excess after capping at K2
-        total_excess_median = np.sum(excess_median)
-
-        # Step 4: Redistribution of excess from K2 to only projects below K2
-        eligible_projects = capped_median_scores < K2
-        redistributed_median_scores = capped_median_scores.copy()
-
-        while total_excess_median > 0:
-            eligible_for_redistribution = capped_median_scores < K2  # Only redistribute to projects under K2
-            
-            if np.any(eligible_for_redistribution) and np.sum(capped_median_scores[eligible_for_redistribution]) > 0:
-                # Redistribute excess only to eligible projects
-                redistributed_median_scores[eligible_for_redistribution] += (
-                    (total_excess_median * capped_median_scores[eligible_for_redistribution]) 
-                    / np.sum(capped_median_scores[eligible_for_redistribution])
-                )
-
-            # Recalculate excess after redistribution
-            total_excess_median = np.sum(np.maximum(0, redistributed_median_scores - K2))
-            redistributed_median_scores = np.minimum(redistributed_median_scores, K2)  # Cap at K2 again
-
-        # Step 5: Normalize to the total budget
-        final_scores = redistributed_median_scores / np.sum(redistributed_median_scores) * total_op_tokens
-
-        # Step 6: Eliminate projects with allocation below K3 and redistribute
-        low_allocation_projects = final_scores < K3
-        if np.any(low_allocation_projects):
-            redistributed_amount = np.sum(final_scores[low_allocation_projects])
-            eligible_for_redistribution = (final_scores >= K3) & (final_scores < K2)  # Only redistribute to projects below K2
-            if np.any(eligible_for_redistribution) and np.sum(final_scores[eligible_for_redistribution]) > 0:
-                final_scores[eligible_for_redistribution] += (redistributed_amount * final_scores[eligible_for_redistribution]) / np.sum(final_scores[eligible_for_redistribution])
-            final_scores[low_allocation_projects] = 0
-
-        # Step 7: Final normalization and capping
-        total_allocated = np.sum(final_scores)
-        if total_allocated > 0:
-            final_allocation = final_scores / total_allocated * total_op_tokens
-        else:
-            final_allocation = final_scores
+        return _capped_median(voting_matrix, total_op_tokens, K1, K2, K3)
 
-        return np.minimum(final_allocation, K2)  # Ensure final capping
-    '''
     def majoritarian_moving_phantoms(self, voting_matrix, total_op_tokens, num_voters):
-            num_voters, num_projects = voting_matrix.shape
-            def f_k(t, k, num_voters):
-                if t <= k / (num_voters + 1):
-                    return 0
-                elif t < (k + 1) / (num_voters + 1):
-                    return (num_voters + 1) * t - k
-                else:
-                    return 1
+        num_voters, num_projects = voting_matrix.shape[-2:]
+
+        # Step 1: Normalize every ballot to shares of the voter's budget
+        ballot_totals = np.sum(voting_matrix, axis=-1, keepdims=True)
+        safe_ballot_totals = np.where(ballot_totals > 0, ballot_totals, 1)
+        real_votes = voting_matrix / safe_ballot_totals
+
+        # Step 2: Median of the real votes and the n + 1 moving phantoms at the t* where the medians sum to 1
+        distribution = _moving_phantoms_distribution(real_votes)
+
+        # Step 3: Scale the distribution to the total budget
+        return distribution * (total_op_tokens / np.sum(distribution, axis=-1, keepdims=True))
+
+
+def r1_quadratic_bribery_cost(voting_matrix, total_op_tokens, target_project, desired_increase, tolerance=1e-9):
+    """
+    Minimal amount d to add to every voter's vote for a project so that its r1_quadratic
+    allocation grows by desired_increase.
+
+    The allocation is T * Q(d) / (Q(d) + R), with Q(d) the sum over voters of sqrt(v_i + d) and R
+    the square-root mass of the other projects, so the target F is reached when Q(d) = F R / (T - F).
+    Q is increasing and concave, so Newton's method started below the root converges to it from
+    below; Q(d) <= Q(0) + n sqrt(d) gives such a starting point.
+
+    Returns:
+    - bribery_cost: The per-voter amount d, or np.inf if the target is unreachable.
+    """
+    voting_matrix = np.asarray(voting_matrix, dtype=float)
+    num_voters = voting_matrix.shape[0]
+    target_votes = voting_matrix[:, target_project]
+    column_mass = np.sum(np.sqrt(voting_matrix), axis=0)
+    target_mass = column_mass[target_project]
+    other_mass = np.sum(column_mass) - target_mass
+
+    target_funds = total_op_tokens * target_mass / (target_mass + other_mass) + desired_increase
+    if target_funds >= total_op_tokens:
+        return np.inf
+    required_mass = target_funds * other_mass / (total_op_tokens - target_funds)
+    if required_mass <= target_mass:
+        return 0.0
+
+    cost = ((required_mass - target_mass) / num_voters) ** 2
+    for _ in range(100):
+        roots = np.sqrt(target_votes + cost)
+        step = (required_mass - np.sum(roots)) / np.sum(0.5 / roots)
+        cost += step
+        if step <= tolerance * max(cost, 1):
+            break
+    return cost
+
+
+def r2_mean_bribery_cost(voting_matrix, total_op_tokens, target_project, desired_increase):
+    """
+    Minimal amount d to add to every voter's vote for a project so that its r2_mean
+    allocation grows by desired_increase.
+
+    The allocation is T * (S_t + n d) / (S + n d), with S_t the column sum of the project and S the
+    sum of all votes, so reaching the target F takes d = (F S - T S_t) / (n (T - F)).
+
+    Returns:
+    - bribery_cost: The per-voter amount d, or np.inf if the target is unreachable.
+    """
+    voting_matrix = np.asarray(voting_matrix, dtype=float)
+    num_voters = voting_matrix.shape[0]
+    target_sum = np.sum(voting_matrix[:, target_project])
+    total_sum = np.sum(voting_matrix)
+
+    target_funds = total_op_tokens * target_sum / total_sum + desired_increase
+    if target_funds >= total_op_tokens:
+        return np.inf
+    return max((target_funds * total_sum - total_op_tokens * target_sum) / (num_voters * (total_op_tokens - target_funds)), 0.0)
+
+
+# Closed-form bribery costs, used by EvalMetrics instead of the numeric search when available.
+# Solvers take (voting_matrix, total_op_tokens, target_project, desired_increase).
+BRIBERY_SOLVERS = {
+    'r1_quadratic': r1_quadratic_bribery_cost,
+    'r2_mean': r2_mean_bribery_cost,
+}
+
+
+def capped_median_thresholds(voting_rule, total_op_tokens):
+    """
+    Thresholds (K1, K2, K3) of the capped median rules.
+
+    - K1 is the maximum number of tokens a single voter can allocate to a single project before redistribution is triggered.
+    - K2 is the maximum median allocation a project can receive before redistribution is triggered.
+    - K3 is the minimum allocation required for a project to receive funding; projects below this threshold are eliminated, and their funds are redistributed.
+    """
+    if voting_rule == 'r4_capped_median':
+        return 500000, 500000, 1000 #0.05*total_op_tokens, 0.05*total_op_tokens, 0.0001*total_op_tokens
+    if voting_rule == 'normalized_median':
+        return total_op_tokens, total_op_tokens, 0
+    raise ValueError(f"Not a capped median rule: {voting_rule}")
+
+
+def _median_allocation(median_votes, votes_count, total_op_tokens):
+    """
+    Steps 2-3 of r3_median: apply the quorum and MIN_AMOUNT gates to the per-project
+    non-zero medians and scale to the budget. Works on (..., projects) arrays.
+    """
+    # Step 2: Apply eligibility criteria (median >= MIN_AMOUNT and votes_count >= quorum)
+    eligible_projects = (median_votes >= MIN_AMOUNT) & (votes_count >= QUORUM)
+    
+    eligible_median_votes = median_votes * eligible_projects
     
-            def median_with_phantoms(t_star, j):
-                phantom_votes = [f_k(t_star, k, num_voters) for k in range(num_voters + 1)]
-                real_votes = voting_matrix[:, j] / sum(voting_matrix[0]) 
-                return np.median(phantom_votes + list(real_votes))
+    # Step 3: Scale the eligible median votes to match the total_op_tokens
+    total_eligible = np.sum(eligible_median_votes, axis=-1, keepdims=True)
+    # Profiles without any eligible project get a zero allocation (avoid division by zero)
+    safe_total_eligible = np.where(total_eligible == 0, 1, total_eligible)
+    scaled_allocations = np.where(total_eligible == 0, 0, (eligible_median_votes / safe_total_eligible) * total_op_tokens)
     
-            def find_t_star():
-                low, high = 0.0, 1.0
-                epsilon = 1e-9
-                while high - low > epsilon:
-                    mid = (low + high) / 2
-                    if sum(median_with_phantoms(mid, j) for j in range(m)) > 1:
-                        high = mid
-                    else:
-                        low = mid
-                return low
-                
-            num_voters, m = voting_matrix.shape
-            t_star = find_t_star()
-            distribution = np.array([median_with_phantoms(t_star, j) for j in range(m)])
-            best_distribution = distribution * (total_op_tokens / np.sum(distribution))
-            return best_distribution
-    '''
-
-
-    
\ No newline at end of file
+    return scaled_allocations
+
+
+def _moving_phantoms_distribution(real_votes):
+    """
+    Majoritarian moving phantoms distribution for (..., voters, projects) ballot shares.
+
+    Phantom k in 0..n moves as f_k(t) = clip((n + 1) * t - k, 0, 1). For t in the k-th interval
+    [k / (n + 1), (k + 1) / (n + 1)] there are k phantoms at 1, n - k phantoms at 0 and one phantom
+    at s = (n + 1) * t - k, so the median of the 2n + 1 values of project j is
+    clip(s, q[k, j], q[k + 1, j]), where q is the column sorted with a 0 prepended and a 1 appended.
+    The sum of the medians is non-decreasing and piecewise linear in t, so t* is found exactly:
+    first the interval from the sums at the breakpoints t = k / (n + 1), then s inside that interval
+    from the sorted clip bounds.
+    """
+    num_voters, num_projects = real_votes.shape[-2:]
+    batch_shape = real_votes.shape[:-2]
+
+    # Bounds of the median in every interval: padded[k] <= median <= padded[k + 1]
+    sorted_votes = np.sort(real_votes, axis=-2)
+    padded_votes = np.concatenate([
+        np.zeros(batch_shape + (1, num_projects)),
+        sorted_votes,
+        np.ones(batch_shape + (1, num_projects)),
+    ], axis=-2)
+
+    # Step 1: Last interval whose starting sum of medians is still at most 1
+    breakpoint_sums = np.sum(padded_votes, axis=-1)
+    interval = np.sum(breakpoint_sums[..., :num_voters + 1] <= 1, axis=-1) - 1
+    interval = np.clip(interval, 0, num_voters)[..., np.newaxis, np.newaxis]
+    lower = np.take_along_axis(padded_votes, interval, axis=-2)[..., 0, :]
+    upper = np.take_along_axis(padded_votes, interval + 1, axis=-2)[..., 0, :]
+
+    # Step 2: Solve sum_j clip(s, lower_j, upper_j) = 1 for s. The slope increases by one at every
+    # lower bound and decreases by one at every upper bound.
+    bounds = np.concatenate([lower, upper], axis=-1)
+    slope_changes = np.concatenate([np.ones_like(lower), -np.ones_like(upper)], axis=-1)
+    order = np.argsort(bounds, axis=-1, kind='stable')
+    bounds = np.take_along_axis(bounds, order, axis=-1)
+    slopes = np.cumsum(np.take_along_axis(slope_changes, order, axis=-1), axis=-1)
+    segment_gains = slopes[..., :-1] * np.diff(bounds, axis=-1)
+    sums_at_bounds = np.sum(lower, axis=-1, keepdims=True) + np.concatenate([
+        np.zeros(batch_shape + (1,)),
+        np.cumsum(segment_gains, axis=-1),
+    ], axis=-1)
+
+    segment = np.clip(np.sum(sums_at_bounds <= 1, axis=-1) - 1, 0, 2 * num_projects - 1)[..., np.newaxis]
+    segment_start = np.take_along_axis(bounds, segment, axis=-1)
+    segment_sum = np.take_along_axis(sums_at_bounds, segment, axis=-1)
+    segment_slope = np.take_along_axis(slopes, segment, axis=-1)
+    safe_segment_slope = np.where(segment_slope > 0, segment_slope, 1)
+    s_star = np.where(segment_slope > 0, segment_start + (1 - segment_sum) / safe_segment_slope, segment_start)
+
+    return np.clip(s_star, lower, upper)
+
+
+def _non_zero_median_and_count(voting_matrix):
+    """
+    Per-project median of the non-zero votes and number of non-zero votes, computed in a
+    single sort over the voter axis of a (..., voters, projects) array. Projects without
+    any vote get a median of 0.
+    """
+    has_vote = voting_matrix > 0
+    votes_count = np.count_nonzero(has_vote, axis=-2)
+
+    # Push the zeros past every real vote, so the first votes_count entries of each sorted
+    # column are exactly the non-zero votes
+    sorted_votes = np.sort(np.where(has_vote, voting_matrix, np.inf), axis=-2)
+    lower_index = np.maximum(votes_count - 1, 0) // 2
+    upper_index = np.minimum(votes_count // 2, voting_matrix.shape[-2] - 1)
+    lower_votes = np.take_along_axis(sorted_votes, lower_index[..., np.newaxis, :], axis=-2)[..., 0, :]
+    upper_votes = np.take_along_axis(sorted_votes, upper_index[..., np.newaxis, :], axis=-2)[..., 0, :]
+
+    median_votes = np.where(votes_count > 0, (lower_votes + upper_votes) / 2, 0)
+    return median_votes, votes_count
+
+
+def _cap_and_redistribute_k1(voting_matrix, K1):
+    """
+    Cap every ballot at K1 and redistribute each voter's excess over their uncapped projects,
+    proportionally to the capped scores. Works row-wise on (..., voters, projects) arrays.
+    """
+    capped_scores = np.minimum(voting_matrix, K1)
+    excess_scores = np.maximum(0, voting_matrix - K1)
+
+    uncapped_projects = capped_scores < K1
+    relevant_capped_scores = np.where(uncapped_projects, capped_scores, 0)
+    relevant_excess_scores = np.where(uncapped_projects, excess_scores, 0)
+    relevant_capped_total = np.sum(relevant_capped_scores, axis=-1, keepdims=True)
+
+    # Only voters with uncapped projects and a positive uncapped total receive the excess.
+    # Note that the excess is taken per project, so it is zero on every uncapped project and
+    # this step reduces to the K1 cap; it is kept in this form to match the rule definition.
+    can_redistribute = uncapped_projects & (relevant_capped_total > 0)
+    safe_capped_total = np.where(relevant_capped_total > 0, relevant_capped_total, 1)
+    proportionate_excess = (relevant_excess_scores * relevant_capped_scores) / safe_capped_total
+
+    return capped_scores + np.where(can_redistribute, proportionate_excess, 0)
+
+
+def _water_fill(capped_median_scores, total_excess_median, K2, tolerance=K2_TOLERANCE):
+    """
+    Redistribute the excess above K2 over the projects below K2, proportionally to their
+    capped median scores, re-capping at K2 until no excess is left.
+
+    Repeated proportional redistribution converges to scaling every eligible project by a
+    common factor lam and capping at K2, with lam chosen so that the eligible projects absorb
+    the excess. Sorting the eligible scores in descending order, if the top j projects end up
+    capped then lam = (eligible_total + excess - j * K2) / (eligible_total - top_j_total), and the
+    solution is the smallest j whose next project stays under the cap. This takes O(m log m)
+    per profile instead of an open-ended loop.
+
+    Parameters:
+    - capped_median_scores: Median scores already capped at K2, shaped (..., projects).
+    - total_excess_median: Excess removed by the cap, shaped (..., 1).
+    - K2: The per-project cap.
+    - tolerance: Excess (in tokens) at or below which nothing is redistributed, also used as
+                 slack when comparing against the cap.
+
+    Returns:
+    - The redistributed scores, shaped (..., projects).
+    """
+    num_projects = capped_median_scores.shape[-1]
+
+    # Only projects under K2 with a positive score can absorb excess
+    eligible_scores = np.where(capped_median_scores < K2, capped_median_scores, 0)
+    eligible_total = np.sum(eligible_scores, axis=-1, keepdims=True)
+
+    # Candidate scale factors for j = 0..m-1 capped projects
+    sorted_scores = -np.sort(-eligible_scores, axis=-1)
+    top_j_total = np.cumsum(sorted_scores, axis=-1) - sorted_scores
+    remaining_total = eligible_total - top_j_total
+    num_capped = np.arange(num_projects)
+    safe_remaining_total = np.where(remaining_total > 0, remaining_total, 1)
+    scale = (eligible_total + total_excess_median - num_capped * K2) / safe_remaining_total
+    valid = (remaining_total > 0) & (scale * sorted_scores <= K2 + tolerance)
+
+    # If no j is valid the eligible projects cannot absorb the excess and all of them end at K2.
+    # Such profiles get a finite placeholder scale, so the product below stays free of inf * 0.
+    has_solution = np.any(valid, axis=-1, keepdims=True)
+    first_valid = np.argmax(valid, axis=-1)[..., np.newaxis]
+    scale = np.where(has_solution, np.take_along_axis(scale, first_valid, axis=-1), 1)
+
+    filled_eligible_scores = np.where(has_solution, np.minimum(scale * eligible_scores, K2), K2)
+    filled_scores = np.where(eligible_scores > 0, filled_eligible_scores, capped_median_scores)
+    needs_redistribution = (total_excess_median > tolerance) & (eligible_total > 0)
+    return np.where(needs_redistribution, filled_scores, capped_median_scores)
+
+
+def _capped_median_allocation(median_scores, total_op_tokens, K2, K3, tolerance=K2_TOLERANCE):
+    """
+    Steps 3-7 of the capped median rules: cap the per-project medians at K2, redistribute the
+    excess, normalize to the budget and eliminate projects below K3. Works on (..., projects) arrays.
+    """
+    # Step 3: Cap at K2 and redistribute
+    capped_median_scores = np.minimum(median_scores, K2)
+    excess_median = np.maximum(0, median_scores - K2)
+
+    # Total excess after capping at K2
+    total_excess_median = np.sum(excess_median, axis=-1, keepdims=True)
+
+    # Step 4: Redistribution of excess from K2 to only projects below K2
+    redistributed_median_scores = _water_fill(capped_median_scores, total_excess_median, K2, tolerance)
+
+    # Step 5: Normalize to the total budget
+    final_scores = redistributed_median_scores / np.sum(redistributed_median_scores, axis=-1, keepdims=True) * total_op_tokens
+
+    # Step 6: Eliminate projects with allocation below K3 and redistribute
+    low_allocation_projects = final_scores < K3
+    redistributed_amount = np.sum(np.where(low_allocation_projects, final_scores, 0), axis=-1, keepdims=True)
+    eligible_for_redistribution = (final_scores >= K3) & (final_scores < K2)  # Only redistribute to projects below K2
+    eligible_total = np.sum(np.where(eligible_for_redistribution, final_scores, 0), axis=-1, keepdims=True)
+    safe_eligible_total = np.where(eligible_total > 0, eligible_total, 1)
+    final_scores = np.where(
+        eligible_for_redistribution & (eligible_total > 0),
+        final_scores + (redistributed_amount * final_scores) / safe_eligible_total,
+        final_scores
+    )
+    final_scores = np.where(low_allocation_projects, 0, final_scores)
+
+    # Step 7: Final normalization and capping
+    total_allocated = np.sum(final_scores, axis=-1, keepdims=True)
+    safe_total_allocated = np.where(total_allocated > 0, total_allocated, 1)
+    final_allocation = np.where(total_allocated > 0, final_scores / safe_total_allocated * total_op_tokens, final_scores)
+
+    return np.minimum(final_allocation, K2)  # Ensure final capping
+
+
+def _capped_median(voting_matrix, total_op_tokens, K1, K2, K3, tolerance=K2_TOLERANCE):
+    """
+    Shared implementation of r4_capped_median and normalized_median.
+    """
+    if isinstance(voting_matrix, OrderStatisticIndex):
+        # Steps 1 and 2: the K1 step reduces to an elementwise cap, which preserves the
+        # order of every column, so the capped medians come straight from the index
+        median_scores = voting_matrix.capped_median(K1)
+    else:
+        # Step 1: Cap at K1 for each voter
+        redistributed_scores = _cap_and_redistribute_k1(voting_matrix, K1)
+
+        # Step 2: Calculate medians
+        median_scores = np.median(redistributed_scores, axis=-2)
+
+    return _capped_median_allocation(median_scores, total_op_tokens, K2, K3, tolerance)